@@ -2,14 +2,18 @@
 Hugging Face Models via OpenRouter - Using .env Configuration
 """
 
-import requests
 import json
 from dotenv import load_dotenv
 import os
 
+import http_client
+import request_trace
+from sse_stream import open_chat_stream
+
 # Load environment variables from .env file
 load_dotenv()
 
+@request_trace.traced
 def query_openrouter(prompt, model="mistralai/mistral-7b-instruct"):
     """
     Query Hugging Face models through OpenRouter using API key from .env
@@ -39,8 +43,8 @@ def query_openrouter(prompt, model="mistralai/mistral-7b-instruct"):
     }
     
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
+        response = http_client.post(
+            http_client.OPENROUTER_URL,
             headers=headers,
             json=payload,
             timeout=60
@@ -55,7 +59,8 @@ def query_openrouter(prompt, model="mistralai/mistral-7b-instruct"):
         return f"Exception: {str(e)}"
 
 
-def query_together_ai(prompt):
+@request_trace.traced
+def query_together_ai(prompt, model="mistralai/Mistral-7B-Instruct-v0.2"):
     """
     Query using Together AI with API key from .env
     """
@@ -73,7 +78,7 @@ def query_together_ai(prompt):
     }
     
     payload = {
-        "model": "mistralai/Mistral-7B-Instruct-v0.2",
+        "model": model,
         "messages": [
             {"role": "user", "content": prompt}
         ],
@@ -82,8 +87,8 @@ def query_together_ai(prompt):
     }
     
     try:
-        response = requests.post(
-            "https://api.together.xyz/v1/chat/completions",
+        response = http_client.post(
+            http_client.TOGETHER_URL,
             headers=headers,
             json=payload,
             timeout=60
@@ -98,7 +103,8 @@ def query_together_ai(prompt):
         return f"Exception: {str(e)}"
 
 
-def query_groq_api(prompt):
+@request_trace.traced
+def query_groq_api(prompt, model="mixtral-8x7b-32768"):
     """
     Query using Groq API with key from .env (EXTREMELY FAST)
     """
@@ -116,7 +122,7 @@ def query_groq_api(prompt):
     }
     
     payload = {
-        "model": "mixtral-8x7b-32768",
+        "model": model,
         "messages": [
             {"role": "user", "content": prompt}
         ],
@@ -125,8 +131,8 @@ def query_groq_api(prompt):
     }
     
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+        response = http_client.post(
+            http_client.GROQ_URL,
             headers=headers,
             json=payload,
             timeout=60
@@ -141,6 +147,95 @@ def query_groq_api(prompt):
         return f"Exception: {str(e)}"
 
 
+@request_trace.traced
+def stream_openrouter(prompt, model="mistralai/mistral-7b-instruct", stop=None):
+    """
+    Stream an OpenRouter completion; iterate the result for content deltas
+    """
+    
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    
+    if not api_key or api_key.startswith("sk-or-v1-YOUR"):
+        print("❌ Error: Set OPENROUTER_API_KEY in .env file")
+        return None
+    
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "HTTP-Referer": "https://github.com",
+        "X-Title": "HF-API-Test",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 500,
+    }
+    
+    return open_chat_stream(http_client.OPENROUTER_URL, headers, payload, stop=stop)
+
+
+@request_trace.traced
+def stream_together_ai(prompt, stop=None, model="mistralai/Mistral-7B-Instruct-v0.2"):
+    """
+    Stream a Together AI completion; iterate the result for content deltas
+    """
+    
+    api_key = os.getenv("TOGETHER_API_KEY")
+    
+    if not api_key or api_key.startswith("YOUR"):
+        print("❌ Error: Set TOGETHER_API_KEY in .env file")
+        return None
+    
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 500,
+        "temperature": 0.7,
+    }
+    
+    return open_chat_stream(http_client.TOGETHER_URL, headers, payload, stop=stop)
+
+
+@request_trace.traced
+def stream_groq_api(prompt, stop=None, model="mixtral-8x7b-32768"):
+    """
+    Stream a Groq completion; iterate the result for content deltas
+    """
+    
+    api_key = os.getenv("GROQ_API_KEY")
+    
+    if not api_key or api_key.startswith("YOUR"):
+        print("❌ Error: Set GROQ_API_KEY in .env file")
+        return None
+    
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 500,
+        "temperature": 0.7,
+    }
+    
+    return open_chat_stream(http_client.GROQ_URL, headers, payload, stop=stop)
+
+
 def main():
     print("=" * 70)
     print("Hugging Face Models via API Providers (.env Configuration)")
@@ -0,0 +1,309 @@
+"""
+Async LLM Provider Client
+Async versions of the provider query functions plus gather_prompts() to
+fan a prompt list out with a cap on in-flight requests.
+Requires: pip install httpx
+"""
+
+import asyncio
+import os
+import time
+import weakref
+
+import httpx
+from dotenv import load_dotenv
+
+import hf_batcher
+import http_client
+import metrics
+import ollama_api
+import rate_limit
+import request_trace
+import response_cache
+import single_flight
+import token_budget
+
+# Load environment variables from .env file
+load_dotenv()
+
+# One pooled client per event loop (httpx clients are bound to their loop)
+_clients = weakref.WeakKeyDictionary()
+
+
+def _http2_available():
+    if not http_client.USE_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_async_client():
+    """
+    Return the pooled async client for the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=http_client.POOL_SIZE * http_client.POOL_HOSTS,
+                max_keepalive_connections=http_client.POOL_SIZE,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose():
+    """Close the running loop's client and its connections"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def post(url, **kwargs):
+    """
+    Send a POST through the loop's pooled client (same arguments as httpx)
+    
+    JSON requests are fitted to the model's context window (token_budget),
+    share the per-provider rate limits and retries, are served from /
+    stored in the shared response cache, are coalesced with identical ones
+    in flight (LLM_SINGLE_FLIGHT=1), and are counted and timed in metrics.
+    """
+    provider = http_client.provider_for(url)
+    payload = kwargs.get("json")
+    model = metrics.model_for(url, payload)
+    if payload is not None and token_budget.ENABLED:
+        payload = kwargs["json"] = token_budget.preflight(url, payload, provider, model)
+    trace, token = request_trace.begin("POST", url, provider)
+    if trace is not None:
+        kwargs["extensions"] = {"trace": trace.httpx_ahook}
+    try:
+        cache = response_cache.get_cache() if payload is not None else None
+        key = None
+        if cache is not None:
+            if response_cache.is_cacheable(payload):
+                # SQLite is blocking: keep it off the event loop
+                key, cached = await asyncio.to_thread(cache.lookup, url, payload)
+            else:
+                key, cached = cache.lookup(url, payload)  # only counts the bypass
+            if cached is not None:
+                if trace is not None:
+                    request_trace.attach(trace, cached)
+                metrics.request_finished(provider, model, "cached", 0.0, cached)
+                return cached
+
+        async def fetch():
+            metrics.request_started(provider)
+            started = time.perf_counter()
+            try:
+                if payload is None:
+                    response = await get_async_client().post(url, **kwargs)
+                else:
+                    response = await rate_limit.send_async(
+                        lambda: get_async_client().post(url, **kwargs), provider, payload
+                    )
+            except asyncio.CancelledError:
+                # e.g. a hedge that lost the race
+                metrics.request_finished(provider, model, "cancelled", time.perf_counter() - started)
+                raise
+            except Exception:
+                metrics.request_finished(provider, model, "exception", time.perf_counter() - started)
+                raise
+            metrics.request_finished(provider, model, response.status_code, time.perf_counter() - started, response)
+            if trace is not None:
+                request_trace.attach(trace, response)
+
+            if key is not None and response.status_code == 200:
+                await asyncio.to_thread(cache.store, key, response)
+            return response
+
+        if payload is None or not single_flight.enabled():
+            return await fetch()
+        started = time.perf_counter()
+        response, shared = await single_flight.do_async("POST", url, kwargs, fetch)
+        if shared:
+            waited = time.perf_counter() - started
+            request_trace.record("coalesced", waited)
+            metrics.request_finished(provider, model, "coalesced", waited)
+        return response
+    finally:
+        request_trace.end(trace, token)
+
+
+async def _chat_completion(url, api_key, model, prompt, extra_headers=None, timeout=60):
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 500,
+        "temperature": 0.7,
+    }
+
+    try:
+        response = await post(url, headers=headers, json=payload, timeout=timeout)
+
+        if response.status_code == 200:
+            result = response.json()
+            return result.get("choices", [{}])[0].get("message", {}).get("content", "No response")
+        else:
+            return f"Error {response.status_code}: {response.text[:200]}"
+    except Exception as e:
+        return f"Exception: {str(e)}"
+
+
+@request_trace.traced
+async def async_call_groq_api(prompt, model="llama-3.3-70b-versatile"):
+    """
+    Async Groq chat completion (see huggingface_working.call_groq_api)
+    """
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key or api_key.startswith("gsk_YOUR"):
+        print("❌ Error: GROQ_API_KEY not configured in .env")
+        return None
+    return await _chat_completion(http_client.GROQ_URL, api_key, model, prompt)
+
+
+@request_trace.traced
+async def async_query_openrouter(prompt, model="mistralai/mistral-7b-instruct"):
+    """
+    Async OpenRouter chat completion (see api_with_env.query_openrouter)
+    """
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key or api_key.startswith("sk-or-v1-YOUR"):
+        print("❌ Error: Set OPENROUTER_API_KEY in .env file")
+        return None
+    extra_headers = {"HTTP-Referer": "https://github.com", "X-Title": "HF-API-Test"}
+    return await _chat_completion(http_client.OPENROUTER_URL, api_key, model, prompt, extra_headers)
+
+
+@request_trace.traced
+async def async_query_together_ai(prompt, model="mistralai/Mistral-7B-Instruct-v0.2"):
+    """
+    Async Together AI chat completion (see api_with_env.query_together_ai)
+    """
+    api_key = os.getenv("TOGETHER_API_KEY")
+    if not api_key or api_key.startswith("YOUR"):
+        print("❌ Error: Set TOGETHER_API_KEY in .env file")
+        return None
+    return await _chat_completion(http_client.TOGETHER_URL, api_key, model, prompt)
+
+
+@request_trace.traced
+async def async_query_ollama(prompt, model="mistral", keep_alive=None, context=None, options=None, host=None):
+    """
+    Async query of the local Ollama instance (see ollama_api.query_ollama;
+    the same arguments, and the same tuned profile is applied)
+
+    Returns:
+        dict: Response from Ollama, or None on error
+    """
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False
+    }
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    if context:
+        payload["context"] = list(context)
+    options = ollama_api.tuned_options(model, options, host)
+    if options:
+        payload["options"] = options
+
+    try:
+        response = await post(f"{host or http_client.OLLAMA_URL}/api/generate", json=payload, timeout=60)
+        response.raise_for_status()
+        return response.json()
+    except httpx.ConnectError:
+        print("Error: Cannot connect to Ollama. Make sure Ollama is running.")
+        return None
+    except httpx.HTTPError as e:
+        print(f"Error: {e}")
+        return None
+
+
+@request_trace.traced
+async def async_call_huggingface_api(prompt, model="mistralai/Mistral-7B-Instruct-v0.3", token=None):
+    """
+    Async Hugging Face inference call (see hf_direct.call_huggingface_api),
+    micro-batched with concurrent calls when HF_BATCH_WINDOW_MS is set
+    """
+    token = token or os.getenv("HF_API_KEY")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    payload = {
+        "inputs": prompt,
+        "parameters": {
+            "max_length": 512,
+            "temperature": 0.7,
+        }
+    }
+
+    url = f"{http_client.HF_INFERENCE_URL}/{model}"
+    try:
+        if hf_batcher.get_batcher() is not None:
+            # The batcher merges concurrent callers on threads; join it from one
+            response = await asyncio.to_thread(hf_batcher.post, url, headers=headers, json=payload, timeout=120)
+        else:
+            response = await post(url, headers=headers, json=payload, timeout=120)
+        if response.status_code == 200:
+            result = response.json()
+            if isinstance(result, list) and len(result) > 0:
+                return result[0].get("generated_text", "No response")
+            return str(result)
+        else:
+            return f"Error {response.status_code}: {response.text[:200]}"
+    except Exception as e:
+        return f"Exception: {str(e)}"
+
+
+async def gather_prompts(prompts, query_fn=async_call_groq_api, concurrency=8, **kwargs):
+    """
+    Run every prompt through query_fn with at most `concurrency` in flight
+
+    Args:
+        prompts (list): Prompt strings
+        query_fn (coroutine function): One of the async_* query functions
+        concurrency (int): Maximum simultaneous requests
+        **kwargs: Passed to query_fn (e.g. model=...)
+
+    Returns:
+        list: Results in the same order as prompts; a failing prompt yields
+              an "Exception: ..." string instead of cancelling the others
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(prompt):
+        async with semaphore:
+            try:
+                return await query_fn(prompt, **kwargs)
+            except Exception as e:
+                return f"Exception: {str(e)}"
+
+    return await asyncio.gather(*(run_one(prompt) for prompt in prompts))
+
+
+def run_prompts(prompts, query_fn=async_call_groq_api, concurrency=8, **kwargs):
+    """
+    Blocking wrapper around gather_prompts() for synchronous callers
+    """
+    async def run():
+        try:
+            return await gather_prompts(prompts, query_fn, concurrency, **kwargs)
+        finally:
+            await aclose()
+
+    return asyncio.run(run())
@@ -0,0 +1,200 @@
+"""
+JSONL Batch Runner with resumable checkpoints
+Streams prompts from a JSONL file through any provider with bounded
+concurrency and appends each result to an output JSONL as soon as it
+completes. The output file doubles as the checkpoint: re-running the same
+command skips every id already answered, so a crashed run resumes where it
+stopped.
+
+Usage:
+    python batch_runner.py prompts.jsonl results.jsonl --provider groq --concurrency 16
+
+Input lines look like {"id": "q1", "prompt": "What is Docker?"}; the field
+names can be changed with --id-field / --prompt-field (the line number is
+used when there is no id). Errored items are retried on the next run; when
+an id appears more than once in the output, the last line wins.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import async_client
+import http_client
+
+PROVIDERS = {
+    "groq": async_client.async_call_groq_api,
+    "openrouter": async_client.async_query_openrouter,
+    "together": async_client.async_query_together_ai,
+    "ollama": async_client.async_query_ollama,
+    "hf": async_client.async_call_huggingface_api,
+}
+
+
+def iter_jsonl(path):
+    """
+    Yield (line number, record) from a JSONL file without loading it all
+
+    Blank and unparsable lines (e.g. a line cut short by a crash) are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def load_checkpoint(path):
+    """
+    Ids already answered successfully in an earlier run of this output file
+    """
+    done = set()
+    try:
+        for _, record in iter_jsonl(path):
+            if record.get("error") is None:
+                done.add(record.get("id"))
+            else:
+                done.discard(record.get("id"))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _ensure_trailing_newline(path):
+    # A crash can leave half a line behind; start the next record on a fresh line
+    try:
+        with open(path, "rb+") as f:
+            if f.seek(0, 2) == 0:
+                return
+            f.seek(-1, 2)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    except FileNotFoundError:
+        pass
+
+
+class Progress:
+    """Throughput, ETA and error counts printed to stderr"""
+
+    def __init__(self, total, skipped, interval=2.0):
+        self.total = total
+        self.skipped = skipped
+        self.done = 0
+        self.errors = 0
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_print = 0.0
+
+    def update(self, error):
+        self.done += 1
+        self.errors += error
+        now = time.monotonic()
+        if now - self.last_print >= self.interval:
+            self.last_print = now
+            self.print(now)
+
+    def print(self, now=None, end="\r"):
+        elapsed = (now or time.monotonic()) - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.skipped - self.done
+        eta = remaining / rate if rate > 0 else float("inf")
+        sys.stderr.write(
+            f"{self.skipped + self.done}/{self.total} done | {rate:.1f} req/s | "
+            f"ETA {eta:.0f}s | errors {self.errors}    {end}"
+        )
+        sys.stderr.flush()
+
+
+async def run_batch(input_path, output_path, query_fn, concurrency=8,
+                    prompt_field="prompt", id_field="id", **kwargs):
+    """
+    Run every not-yet-answered prompt in input_path and append results
+
+    Args:
+        input_path (str): JSONL prompts
+        output_path (str): JSONL results (also the resume checkpoint)
+        query_fn (coroutine function): One of the async_client query functions
+        concurrency (int): Maximum simultaneous requests
+        prompt_field, id_field (str): Input field names
+        **kwargs: Passed to query_fn (e.g. model=...)
+
+    Returns:
+        Progress: Final counters
+    """
+    done = load_checkpoint(output_path)
+    total = sum(1 for _ in iter_jsonl(input_path))
+    progress = Progress(total, skipped=len(done))
+    _ensure_trailing_newline(output_path)
+
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def produce():
+        for number, record in iter_jsonl(input_path):
+            item_id = record.get(id_field, number)
+            if item_id in done:
+                continue
+            await queue.put((item_id, record.get(prompt_field, "")))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work(out):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            item_id, prompt = item
+            started = time.perf_counter()
+            try:
+                result = await query_fn(prompt, **kwargs)
+            except Exception as e:
+                result = f"Exception: {str(e)}"
+            latency = time.perf_counter() - started
+
+            error = None
+            if http_client.is_error_result(result):
+                error = result or "No response"
+                result = None
+            elif isinstance(result, dict):
+                result = result.get("response", result)
+
+            out.write(json.dumps({"id": item_id, "response": result, "error": error,
+                                  "latency": round(latency, 3)}) + "\n")
+            out.flush()
+            progress.update(error is not None)
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        try:
+            await asyncio.gather(produce(), *(work(out) for _ in range(concurrency)))
+        finally:
+            await async_client.aclose()
+    progress.print(end="\n")
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through an LLM provider")
+    parser.add_argument("input", help="JSONL file with one prompt per line")
+    parser.add_argument("output", help="JSONL results file (re-run to resume)")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="groq")
+    parser.add_argument("--model", help="Model name (provider default if omitted)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--id-field", default="id")
+    args = parser.parse_args()
+
+    kwargs = {"model": args.model} if args.model else {}
+    progress = asyncio.run(run_batch(
+        args.input, args.output, PROVIDERS[args.provider], args.concurrency,
+        args.prompt_field, args.id_field, **kwargs
+    ))
+    sys.exit(1 if progress.errors else 0)
+
+
+if __name__ == "__main__":
+    main()
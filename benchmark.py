@@ -0,0 +1,203 @@
+"""
+Provider Latency and Throughput Benchmark
+Runs a fixed prompt set through each query function and reports
+time-to-first-token, latency percentiles (p50/p95/p99), output tokens/sec
+and client-side CPU per request as JSON, so runs can be diffed to catch
+regressions in the client layer.
+
+Usage:
+    python benchmark.py --targets ollama groq --repeats 5 --stream --output bench.json
+    python benchmark.py --targets ollama --compare bench.json
+"""
+
+import argparse
+import json
+import platform
+import socket
+import sys
+import time
+
+import http_client
+import response_cache
+from api_with_env import query_openrouter, query_together_ai, stream_groq_api, stream_openrouter, stream_together_ai
+from hf_direct import call_huggingface_api
+from huggingface_working import call_groq_api
+from ollama_api import query_ollama, stream_ollama
+
+PROMPTS = [
+    "What is Docker? Explain in 2-3 sentences.",
+    "Explain this code: x = [i for i in range(10) if i % 2 == 0]",
+    "What is Kubernetes? (1-2 sentences)",
+    "Write a haiku about programming",
+]
+
+
+def _text_tokens(result):
+    # Provider functions return text (or an Ollama dict); estimate ~4 chars per token
+    if isinstance(result, dict):
+        return result.get("response", ""), result.get("eval_count")
+    return result, len(result) // 4
+
+
+# name -> (blocking query function, streaming function or None)
+TARGETS = {
+    "ollama": (query_ollama, stream_ollama),
+    "groq": (call_groq_api, lambda prompt: stream_groq_api(prompt, model="llama-3.3-70b-versatile")),
+    "openrouter": (query_openrouter, stream_openrouter),
+    "together": (query_together_ai, stream_together_ai),
+    "hf": (call_huggingface_api, None),
+}
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a list (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values, scale=1.0, digits=2):
+    """p50/p95/p99/mean of values (multiplied by scale)"""
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50) * scale, digits),
+        "p95": round(percentile(values, 95) * scale, digits),
+        "p99": round(percentile(values, 99) * scale, digits),
+        "mean": round(sum(values) / len(values) * scale, digits),
+    }
+
+
+def measure(query_fn, stream_fn, prompt, stream=False):
+    """
+    Time one request
+
+    Returns:
+        dict: latency, ttft (streaming only), tokens, cpu seconds, ok
+    """
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    ttft = None
+    tokens = None
+
+    if stream and stream_fn is not None:
+        handle = stream_fn(prompt)
+        ok = handle is not None
+        if ok:
+            pieces = sum(1 for _ in handle)
+            ttft = handle.time_to_first_token
+            stats = getattr(handle, "stats", None) or {}
+            usage = getattr(handle, "usage", None) or {}
+            tokens = stats.get("eval_count") or usage.get("completion_tokens") or pieces
+    else:
+        result = query_fn(prompt)
+        ok = not http_client.is_error_result(result)
+        if ok:
+            _, tokens = _text_tokens(result)
+
+    return {
+        "latency": time.perf_counter() - started,
+        "ttft": ttft,
+        "tokens": tokens,
+        "cpu": time.process_time() - cpu_started,
+        "ok": ok,
+    }
+
+
+def run_target(name, prompts, repeats=3, warmup=1, stream=False):
+    """
+    Benchmark one target
+
+    Returns:
+        dict: Request/error counts plus ttft_ms, latency_ms, tokens_per_sec
+              and cpu_ms_per_request summaries
+    """
+    query_fn, stream_fn = TARGETS[name]
+    for prompt in prompts[:warmup]:
+        measure(query_fn, stream_fn, prompt, stream)
+
+    samples = [measure(query_fn, stream_fn, prompt, stream)
+               for _ in range(repeats) for prompt in prompts]
+    good = [s for s in samples if s["ok"]]
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(good),
+        "streamed": bool(stream and stream_fn),
+        "ttft_ms": summarize([s["ttft"] for s in good if s["ttft"] is not None], 1000),
+        "latency_ms": summarize([s["latency"] for s in good], 1000),
+        "tokens_per_sec": summarize([s["tokens"] / s["latency"] for s in good if s["tokens"] and s["latency"] > 0]),
+        "cpu_ms_per_request": summarize([s["cpu"] for s in samples], 1000, 3),
+    }
+
+
+def compare(current, baseline, threshold=0.10):
+    """
+    List regressions where a latency/TTFT/CPU percentile grew by > threshold
+
+    Returns:
+        list: Human-readable regression lines
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        for metric in ("latency_ms", "ttft_ms", "cpu_ms_per_request"):
+            for stat in ("p50", "p95", "p99"):
+                new = (result.get(metric) or {}).get(stat)
+                old = (before.get(metric) or {}).get(stat)
+                if new is not None and old and new > old * (1 + threshold):
+                    regressions.append(f"{name} {metric}.{stat}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM provider query functions")
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=["ollama"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--stream", action="store_true", help="Use streaming calls to measure TTFT")
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Regression threshold (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    # Measure the providers, not the cache
+    response_cache.configure(enabled=False)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": socket.gethostname(),
+            "python": platform.python_version(),
+            "prompts": len(PROMPTS),
+            "repeats": args.repeats,
+            "stream": args.stream,
+        },
+        "results": {},
+    }
+    for name in args.targets:
+        print(f"Benchmarking {name}...", file=sys.stderr)
+        report["results"][name] = run_target(name, PROMPTS, args.repeats, args.warmup, args.stream)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
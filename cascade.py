@@ -0,0 +1,276 @@
+"""
+Cascade Routing: small model first, large model only when needed
+Each prompt goes to a small, fast model (a small Groq model or local
+Ollama). The answer is scored by a cheap heuristic (or a verifier model)
+and only prompts whose answer scores below the threshold are sent to the
+large model. Stats report how often requests escalated, the latency and
+cost saved compared with always using the large model, and the escalation
+rate other thresholds would have given.
+
+Usage:
+    cascade = Cascade()                       # llama-3.1-8b-instant -> llama-3.3-70b-versatile
+    answer = cascade.query("What is Docker?")
+    print(cascade.stats())
+
+    cascade = Cascade(small=ollama_tier("llama3.2"), threshold=0.7)
+"""
+
+import collections
+import re
+import threading
+import time
+
+import http_client
+from huggingface_working import call_groq_api
+from ollama_api import query_ollama
+from provider_router import ProviderStats
+
+# Phrases that usually mean the model couldn't answer
+_UNSURE = re.compile(
+    r"\b(i'?m not sure|i am not sure|i don'?t know|i do not know|i cannot|i can'?t|unable to|"
+    r"as an ai|i'?m sorry|not enough information|unclear)\b",
+    re.IGNORECASE,
+)
+
+# Prompts this short ("What is 2 + 2?") can be answered in a word
+SHORT_PROMPT_WORDS = 12
+
+# Thresholds reported in stats()["escalation_at"]
+THRESHOLDS = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8)
+
+
+class Tier:
+    """
+    One model in the cascade
+
+    Args:
+        name (str): Label used in stats
+        query_fn (callable): query_fn(prompt, model=...) provider function
+        model (str): Model passed to query_fn
+        price_in, price_out (float): USD per million input / output tokens
+    """
+
+    def __init__(self, name, query_fn, model, price_in=0.0, price_out=0.0):
+        self.name = name
+        self.query_fn = query_fn
+        self.model = model
+        self.price_in = price_in
+        self.price_out = price_out
+        self.stats = ProviderStats()
+
+    def call(self, prompt):
+        """
+        Returns:
+            tuple: (text or None, seconds, cost in USD)
+        """
+        started = time.perf_counter()
+        try:
+            result = self.query_fn(prompt, model=self.model)
+        except Exception as e:
+            result = f"Exception: {str(e)}"
+        seconds = time.perf_counter() - started
+
+        if http_client.is_error_result(result):
+            self.stats.record(seconds, ok=False)
+            return None, seconds, 0.0
+        if isinstance(result, dict):  # Ollama
+            text = result.get("response", "")
+            tokens_in = result.get("prompt_eval_count") or len(prompt) // 4
+            tokens_out = result.get("eval_count") or len(text) // 4
+        else:
+            text = result
+            tokens_in, tokens_out = len(prompt) // 4, len(text) // 4
+        self.stats.record(seconds, ok=True, tokens=tokens_out)
+        return text, seconds, self.cost(tokens_in, tokens_out)
+
+    def cost(self, tokens_in, tokens_out):
+        return (tokens_in * self.price_in + tokens_out * self.price_out) / 1e6
+
+
+def groq_tier(model, price_in, price_out):
+    return Tier(f"groq:{model}", call_groq_api, model, price_in, price_out)
+
+
+def ollama_tier(model="llama3.2"):
+    """Local model: no per-token cost"""
+    return Tier(f"ollama:{model}", query_ollama, model)
+
+
+def heuristic_score(prompt, answer):
+    """
+    Cheap confidence score for an answer, 0 (escalate) to 1 (keep)
+
+    Penalizes empty or very short answers, hedging/refusal phrases,
+    repetition loops and answers that stop mid-sentence. Length and final
+    punctuation aren't checked for short prompts, whose answer may be "4".
+    """
+    text = (answer or "").strip()
+    if not text:
+        return 0.0
+    score = 1.0
+    words = text.split()
+    prompt_words = len(prompt.split())
+    long_prompt = prompt_words > SHORT_PROMPT_WORDS
+    # Longer questions deserve longer answers
+    if long_prompt and len(words) < min(20, 3 + prompt_words // 4):
+        score -= 0.3
+    if _UNSURE.search(text):
+        score -= 0.5  # alone enough to escalate at the default threshold
+    if len(words) >= 30 and len(set(w.lower() for w in words)) / len(words) < 0.35:
+        score -= 0.4
+    if long_prompt and text[-1] not in ".!?`)\"'*" and not text.endswith("```"):
+        score -= 0.2
+    return max(0.0, score)
+
+
+def verifier_score(verify_fn=call_groq_api, model="llama-3.1-8b-instant", price_in=0.05, price_out=0.08):
+    """
+    Score answers by asking a small model to grade them
+
+    Args:
+        price_in, price_out (float): The verifier's USD per million tokens,
+                                     charged against the cascade's savings
+
+    Returns:
+        callable: (prompt, answer) -> (score in [0, 1], cost in USD); the
+                  score is 0 if the grade can't be read
+    """
+    verifier = Tier(f"verifier:{model}", verify_fn, model, price_in, price_out)
+
+    def score(prompt, answer):
+        if not (answer or "").strip():
+            return 0.0, 0.0
+        grade, _, cost = verifier.call(
+            "Rate from 0 to 10 how correctly and completely the answer addresses the question. "
+            f"Reply with the number only.\n\nQuestion: {prompt}\n\nAnswer: {answer}"
+        )
+        match = re.search(r"\d+(\.\d+)?", grade or "")
+        return (min(1.0, float(match.group()) / 10) if match else 0.0), cost
+
+    score.verifier = verifier
+    return score
+
+
+class Cascade:
+    """
+    Try the small tier, escalate to the large tier on a low score
+
+    Args:
+        small (Tier): Fast, cheap model (default Groq llama-3.1-8b-instant)
+        large (Tier): Strong model (default Groq llama-3.3-70b-versatile)
+        scorer (callable): scorer(prompt, answer) -> 0..1, or (0..1, cost in
+                           USD) for scorers that call a model (heuristic_score,
+                           verifier_score()); its time and cost count
+                           against the savings
+        threshold (float): Answers scoring below this are escalated
+        max_small_chars (int): Longer prompts go straight to the large tier (None = never)
+        window (int): Recent scores kept for stats()["escalation_at"]
+    """
+
+    def __init__(self, small=None, large=None, scorer=heuristic_score, threshold=0.6,
+                 max_small_chars=None, window=1000):
+        # Groq list prices, USD per million tokens (in, out)
+        self.small = small or groq_tier("llama-3.1-8b-instant", 0.05, 0.08)
+        self.large = large or groq_tier("llama-3.3-70b-versatile", 0.59, 0.79)
+        self.scorer = scorer
+        self.threshold = threshold
+        self.max_small_chars = max_small_chars
+        self.scores = collections.deque(maxlen=window)
+        self.requests = 0
+        self.kept = 0
+        self.escalated = 0
+        self.direct = 0
+        self.small_errors = 0
+        self.seconds_saved = 0.0
+        self.cost_saved = 0.0
+        self._lock = threading.Lock()
+
+    def _large_estimate(self, prompt, text):
+        # What the large tier would have cost for this answer, and taken
+        latency = self.large.stats.ewma_latency
+        return latency, self.large.cost(len(prompt) // 4, len(text) // 4)
+
+    def query(self, prompt):
+        """
+        Answer prompt, escalating when the small model's answer looks weak
+
+        Returns:
+            str: Response text, or None if both tiers failed
+        """
+        with self._lock:
+            self.requests += 1
+        if self.max_small_chars is not None and len(prompt) > self.max_small_chars:
+            with self._lock:
+                self.direct += 1
+            return self.large.call(prompt)[0]
+
+        text, small_seconds, small_cost = self.small.call(prompt)
+        score, score_cost = 0.0, 0.0
+        started = time.perf_counter()
+        if text is not None:
+            score = self.scorer(prompt, text)
+            if isinstance(score, tuple):
+                score, score_cost = score
+        # The small call and the scoring are what the cascade adds
+        small_seconds += time.perf_counter() - started
+        small_cost += score_cost
+        with self._lock:
+            if text is None:
+                self.small_errors += 1
+            else:
+                self.scores.append(score)
+            # Latency is only compared once the large tier has been timed
+            large_seconds, large_cost = self._large_estimate(prompt, text or "")
+            if score >= self.threshold:
+                self.kept += 1
+                if large_seconds is not None:
+                    self.seconds_saved += large_seconds - small_seconds
+                self.cost_saved += large_cost - small_cost
+                return text
+            self.escalated += 1
+            # The small call was wasted
+            if large_seconds is not None:
+                self.seconds_saved -= small_seconds
+            self.cost_saved -= small_cost
+
+        large_text = self.large.call(prompt)[0]
+        # The large model failed: a weak answer beats none
+        return large_text if large_text is not None else text
+
+    def stats(self):
+        """
+        Returns:
+            dict: requests, escalation_rate, seconds/cost saved versus always
+                  using the large tier (seconds_saved is None until the
+                  large tier has been timed, and counted from then on), and
+                  the escalation rate each of THRESHOLDS would have given
+                  on recent answers
+        """
+        with self._lock:
+            scores = list(self.scores)
+            routed = self.kept + self.escalated
+            return {
+                "requests": self.requests,
+                "kept": self.kept,
+                "escalated": self.escalated,
+                "direct": self.direct,
+                "small_errors": self.small_errors,
+                "escalation_rate": self.escalated / routed if routed else 0.0,
+                "threshold": self.threshold,
+                "seconds_saved": (round(self.seconds_saved, 3)
+                                  if self.large.stats.ewma_latency is not None else None),
+                "cost_saved_usd": round(self.cost_saved, 6),
+                "escalation_at": {t: sum(s < t for s in scores) / len(scores) if scores else 0.0
+                                  for t in THRESHOLDS},
+                "small": self.small.stats.snapshot(),
+                "large": self.large.stats.snapshot(),
+            }
+
+
+if __name__ == "__main__":
+    cascade = Cascade()
+    for prompt in ["What is 2 + 2?",
+                   "What is Docker? Explain in one sentence.",
+                   "Compare Kubernetes and Docker Swarm for a 50-service deployment."]:
+        print(f"Q: {prompt}\nA: {cascade.query(prompt)}\n")
+    print(cascade.stats())
@@ -0,0 +1,319 @@
+"""
+Batched Embeddings and Retrieval
+Embeds large document sets with Ollama's /api/embed, several texts per
+request and a few requests in flight at once, and keeps the vectors in a
+memory-mapped VectorIndex beside the passage texts. Passages can be added
+and deleted incrementally; saving only appends what changed. Search
+results turn into retrieval-augmented prompts for query_ollama or
+call_groq_api.
+
+Environment:
+    LLM_EMBED_MODEL         Ollama embedding model (default nomic-embed-text)
+    LLM_EMBED_BATCH         texts per /api/embed request (default 64)
+    LLM_EMBED_CONCURRENCY   requests in flight (default 4)
+
+Usage:
+    store = DocumentStore(".rag_index")
+    store.add_documents({"docker.md": open("docker.md").read()})
+    store.save()
+    print(ask("How do I publish a port?", store))
+    print(ask("How do I publish a port?", store, provider="groq"))
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from huggingface_working import call_groq_api
+from ollama_api import embed_ollama, query_ollama
+from text_split import split_text
+from vector_index import VectorIndex
+
+EMBED_MODEL = os.getenv("LLM_EMBED_MODEL", "nomic-embed-text")
+EMBED_BATCH = int(os.getenv("LLM_EMBED_BATCH", "64"))
+EMBED_CONCURRENCY = int(os.getenv("LLM_EMBED_CONCURRENCY", "4"))
+
+# Deleted passages are dropped from disk once they are this share of the index
+COMPACT_RATIO = 0.25
+
+
+def embed_texts(texts, model=EMBED_MODEL, batch_size=EMBED_BATCH, concurrency=EMBED_CONCURRENCY):
+    """
+    Embed many texts: batch_size texts per request, concurrency requests at once
+
+    Returns:
+        np.ndarray: float32 matrix, one row per text, or None if any request failed
+    """
+    texts = list(texts)
+    if not texts:
+        return None
+    chunks = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(chunks)))) as pool:
+        results = list(pool.map(lambda chunk: embed_ollama(chunk, model=model), chunks))
+    if any(result is None or len(result) != len(chunk) for result, chunk in zip(results, chunks)):
+        return None
+    return np.asarray([vector for result in results for vector in result], dtype=np.float32)
+
+
+class DocumentStore:
+    """
+    Passages with their embeddings, searchable by similarity
+
+    Args:
+        path (str): Directory for persistence (None keeps it in memory)
+        model (str): Ollama embedding model
+        ivf_threshold (int): Switch to IVF search above this many passages
+    """
+
+    def __init__(self, path=None, model=EMBED_MODEL, ivf_threshold=50000):
+        self.path = path
+        self.model = model
+        self.ivf_threshold = ivf_threshold
+        self._rows = {}          # passage id -> live row
+        self._saved_docs = 0     # passages already in docs.jsonl
+        self._next_id = 0        # default ids are never reused, even after delete()
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(os.path.join(path, "docs.jsonl")):
+            self.index = VectorIndex.load(path, mmap=True)
+            with open(os.path.join(path, "docs.jsonl")) as f:
+                self.docs = [json.loads(line) for line in f if line.strip()]
+            # A save interrupted between the two files leaves one of them
+            # longer than the other: drop the rows that aren't in both
+            del self.docs[len(self.index):]
+            self.index.truncate(len(self.docs))
+            self._saved_docs = len(self.docs)
+            deleted = self.index.deleted
+            for row, doc in enumerate(self.docs):
+                if deleted is None or not deleted[row]:
+                    self._rows[doc["id"]] = row
+            state_path = os.path.join(path, "store.json")
+            if os.path.exists(state_path):
+                with open(state_path) as f:
+                    self._next_id = json.load(f)["next_id"]
+            else:
+                self._next_id = len(self.docs)
+        else:
+            self.index = VectorIndex()
+            self.docs = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _check_ids(self, ids, replace):
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate passage ids")
+        taken = [doc_id for doc_id in ids if doc_id in self._rows]
+        if taken and not replace:
+            raise ValueError(f"Passage ids already in the store: {taken[:5]} (pass replace=True)")
+
+    def _new_ids(self, n):
+        ids = []
+        while len(ids) < n:
+            doc_id = str(self._next_id)
+            self._next_id += 1
+            if doc_id not in self._rows:
+                ids.append(doc_id)
+        return ids
+
+    def add(self, texts, ids=None, metadata=None, replace=False):
+        """
+        Embed and add passages
+
+        Args:
+            texts (list): Passage texts
+            ids (list): Passage ids (default: running numbers, never reused)
+            metadata (list): Optional dict per passage
+            replace (bool): Replace passages whose id is already in the store
+                            (otherwise that raises ValueError)
+
+        Returns:
+            list: Ids added, or None if embedding failed
+        """
+        texts = list(texts)
+        if ids is not None:
+            ids = list(ids)
+            with self._lock:
+                self._check_ids(ids, replace)
+        vectors = embed_texts(texts, model=self.model)
+        if vectors is None:
+            return None
+        with self._lock:
+            return self._insert(vectors, texts, ids, metadata, replace)
+
+    def _insert(self, vectors, texts, ids, metadata, replace):
+        # Called with self._lock held
+        if ids is None:
+            ids = self._new_ids(len(texts))
+        else:
+            self._check_ids(ids, replace)  # again: another add() may have run meanwhile
+        metadata = metadata or [None] * len(texts)
+        replaced = [self._rows.pop(i) for i in ids if i in self._rows]
+        if replaced:
+            self.index.delete(replaced)
+        rows = self.index.add(vectors)
+        for row, doc_id, text, meta in zip(rows, ids, texts, metadata):
+            self.docs.append({"id": doc_id, "text": text, "meta": meta})
+            self._rows[doc_id] = int(row)
+        if self.index.centroids is None and len(self._rows) > self.ivf_threshold:
+            self.index.train_ivf()
+        return ids
+
+    def add_documents(self, documents, max_chars=1000, overlap=150):
+        """
+        Split documents into passages and add them
+
+        Args:
+            documents (dict): Document id -> text (re-adding an id replaces it)
+
+        Returns:
+            list: Passage ids ("<doc id>#<n>"), or None if embedding failed
+                  (the documents' old passages are then kept)
+        """
+        texts, ids, metadata = [], [], []
+        for doc_id, text in documents.items():
+            for n, passage in enumerate(split_text(text, max_chars, overlap)):
+                texts.append(passage)
+                ids.append(f"{doc_id}#{n}")
+                metadata.append({"doc": doc_id})
+        vectors = embed_texts(texts, model=self.model) if texts else None
+        if texts and vectors is None:
+            return None
+        with self._lock:
+            self._delete(set(documents))
+            return self._insert(vectors, texts, ids, metadata, replace=True) if texts else []
+
+    def delete(self, ids):
+        """
+        Remove passages by id, or every passage of the given document ids
+
+        Returns:
+            int: Passages removed
+        """
+        with self._lock:
+            return self._delete(set(ids))
+
+    def _delete(self, ids):
+        # Called with self._lock held
+        rows = [row for doc_id, row in self._rows.items()
+                if doc_id in ids or (self.docs[row]["meta"] or {}).get("doc") in ids]
+        for row in rows:
+            del self._rows[self.docs[row]["id"]]
+        if rows:
+            self.index.delete(rows)
+        return len(rows)
+
+    def search(self, query, k=4):
+        """
+        Passages most similar to query
+
+        Returns:
+            list: {"id", "text", "score", "meta"} dicts, best first
+        """
+        return self.search_many([query], k)[0]
+
+    def search_many(self, queries, k=4):
+        """search() for several queries with one embedding call and one matrix product"""
+        vectors = embed_texts(queries, model=self.model)
+        if vectors is None:
+            return [[] for _ in queries]
+        with self._lock:
+            rows, scores = self.index.search_many(vectors, k)
+            return [[dict(self.docs[row], score=float(score)) for row, score in zip(hit_rows, hit_scores) if row >= 0]
+                    for hit_rows, hit_scores in zip(rows, scores)]
+
+    def compact(self):
+        """Drop deleted passages from the vectors and texts"""
+        with self._lock:
+            mapping = self.index.compact()
+            self.docs = [doc for row, doc in enumerate(self.docs) if mapping[row] >= 0]
+            self._rows = {doc["id"]: row for row, doc in enumerate(self.docs)}
+            self._saved_docs = None
+
+    def save(self):
+        """Persist to self.path, appending only passages added since the last save"""
+        if not self.path:
+            return
+        if self.index.n_deleted > COMPACT_RATIO * max(1, len(self.docs)):
+            self.compact()
+        with self._lock:
+            # Texts first: if the vectors aren't written after them, loading
+            # drops the extra texts (and the other way round)
+            os.makedirs(self.path, exist_ok=True)
+            docs_path = os.path.join(self.path, "docs.jsonl")
+            if self._saved_docs is None:
+                tmp = f"{docs_path}.tmp"
+                with open(tmp, "w") as f:
+                    f.writelines(json.dumps(doc) + "\n" for doc in self.docs)
+                os.replace(tmp, docs_path)
+            else:
+                with open(docs_path, "a") as f:
+                    f.writelines(json.dumps(doc) + "\n" for doc in self.docs[self._saved_docs:])
+            self._saved_docs = len(self.docs)
+            self.index.save(self.path)
+            with open(os.path.join(self.path, "store.json"), "w") as f:
+                json.dump({"next_id": self._next_id}, f)
+
+    def stats(self):
+        return {"passages": len(self._rows), "deleted": self.index.n_deleted,
+                "dim": self.index.dim, "ivf": self.index.centroids is not None}
+
+
+def build_prompt(question, hits, max_chars=6000):
+    """
+    Retrieval-augmented prompt: numbered passages, then the question
+
+    Args:
+        question (str): The user's question
+        hits (list): DocumentStore.search() results
+        max_chars (int): Budget for the passages (best ones are kept)
+
+    Returns:
+        str: Prompt for query_ollama / call_groq_api
+    """
+    context = []
+    used = 0
+    for n, hit in enumerate(hits, 1):
+        if context and used + len(hit["text"]) > max_chars:
+            break
+        source = (hit.get("meta") or {}).get("doc", hit["id"])
+        context.append(f"[{n}] ({source}) {hit['text']}")
+        used += len(hit["text"])
+    if not context:
+        return question
+    passages = "\n\n".join(context)
+    return ("Answer the question using the context below. Cite passages as [n]. "
+            "If the context doesn't contain the answer, say so.\n\n"
+            f"Context:\n{passages}\n\nQuestion: {question}\nAnswer:")
+
+
+def ask(question, store, k=4, provider="ollama", model=None, max_chars=6000):
+    """
+    Retrieve passages for question and answer it with Ollama or Groq
+
+    Returns:
+        str: The answer, or None on error
+    """
+    prompt = build_prompt(question, store.search(question, k), max_chars)
+    if provider == "groq":
+        return call_groq_api(prompt, model=model) if model else call_groq_api(prompt)
+    result = query_ollama(prompt, model=model or "mistral")
+    return result.get("response") if result else None
+
+
+if __name__ == "__main__":
+    store = DocumentStore()
+    store.add_documents({
+        "docker": "Docker packages an application with its dependencies into an image. "
+                  "Containers are running instances of images. Use `docker run -p 8080:80 nginx` "
+                  "to publish container port 80 on host port 8080.",
+        "ollama": "Ollama runs open-source models locally. `ollama pull mistral` downloads a model, "
+                  "and the HTTP API listens on port 11434.",
+    })
+    print(store.stats())
+    for hit in store.search("Which port does Ollama listen on?", k=2):
+        print(f"{hit['score']:.3f} {hit['id']}: {hit['text'][:80]}")
+    print(ask("Which port does Ollama listen on?", store))
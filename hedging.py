@@ -0,0 +1,175 @@
+"""
+Hedged Requests for tail latency
+If the primary provider hasn't answered within its observed p95, the same
+prompt also goes to a secondary provider. The first good answer wins and
+the other request is cancelled (its connection is closed). A budget caps
+hedges at a fraction of all requests so extra cost stays bounded. A primary
+that fails before the hedge delay fails over to the secondary instead (not
+counted as a hedge).
+Requires: pip install httpx
+"""
+
+import asyncio
+import threading
+import time
+
+import http_client
+from provider_router import ProviderStats
+
+
+class HedgeBudget:
+    """
+    Allow at most max_extra hedges per request (e.g. 0.1 = 10% extra calls),
+    plus one so the very first slow request can hedge
+    """
+
+    def __init__(self, max_extra=0.1):
+        self.max_extra = max_extra
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_spend(self):
+        with self._lock:
+            if self.hedges + 1 > self.max_extra * self.requests + 1:
+                return False
+            self.hedges += 1
+            return True
+
+
+class Hedger:
+    """
+    Send to primary, hedge to secondary after the primary's p95
+
+    Args:
+        primary (coroutine function): e.g. async_client.async_call_groq_api
+        secondary (coroutine function): e.g. async_client.async_query_together_ai
+        max_extra (float): Hedge budget as a fraction of requests
+        default_delay (float): Hedge delay until the primary has latency history
+        min_delay (float): Never hedge sooner than this
+        primary_kwargs, secondary_kwargs (dict): Extra arguments (e.g. model=...)
+    """
+
+    def __init__(self, primary, secondary, max_extra=0.1, default_delay=2.0, min_delay=0.05,
+                 primary_kwargs=None, secondary_kwargs=None):
+        self.primary = primary
+        self.secondary = secondary
+        self.primary_kwargs = primary_kwargs or {}
+        self.secondary_kwargs = secondary_kwargs or {}
+        self.budget = HedgeBudget(max_extra)
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.latency = ProviderStats()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self.budget_denied = 0
+
+    def hedge_delay(self):
+        p95 = self.latency.p95()
+        return max(self.min_delay, p95 if p95 is not None else self.default_delay)
+
+    async def _timed_primary(self, prompt):
+        started = time.perf_counter()
+        try:
+            result = await self.primary(prompt, **self.primary_kwargs)
+        except asyncio.CancelledError:
+            # Lost to a hedge: its latency is at least this long, keep p95 honest
+            self.latency.record(time.perf_counter() - started, ok=True)
+            raise
+        self.latency.record(time.perf_counter() - started, ok=not http_client.is_error_result(result))
+        return result
+
+    async def query(self, prompt):
+        """
+        Answer prompt, hedging to the secondary when the primary is slow
+
+        Returns:
+            Whatever the winning provider function returned
+        """
+        self.requests += 1
+        self.budget.count_request()
+
+        primary = asyncio.create_task(self._timed_primary(prompt))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+        if done:
+            result = primary.result()
+            if not http_client.is_error_result(result):
+                return result
+            # The primary failed early: that's a failover, not a hedge
+            self.failovers += 1
+            fallback = await self.secondary(prompt, **self.secondary_kwargs)
+            return result if http_client.is_error_result(fallback) else fallback
+
+        if not self.budget.try_spend():
+            self.budget_denied += 1
+            return await primary
+
+        self.hedged += 1
+        secondary = asyncio.create_task(self.secondary(prompt, **self.secondary_kwargs))
+        pending = {primary, secondary}
+        result = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if not http_client.is_error_result(result):
+                        if task is secondary:
+                            self.hedge_wins += 1
+                        return result
+            return result
+        finally:
+            # Cancel the loser so its connection is closed right away
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self):
+        """
+        Returns:
+            dict: requests, hedged, hedge_wins, failovers, budget_denied,
+                  hedge/win rates
+        """
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "budget_denied": self.budget_denied,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "hedge_win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            "primary_p95": self.latency.p95(),
+        }
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    # One event loop for every synchronous caller, so the pooled AsyncClient
+    # (and its warm TLS connections) outlives each call
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="hedging-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def hedged_query(prompt, hedger, timeout=None):
+    """
+    Blocking wrapper around Hedger.query() for synchronous callers
+
+    Runs on a shared background event loop, so connections are reused
+    across calls (and from several threads at once).
+    """
+    return asyncio.run_coroutine_threadsafe(hedger.query(prompt), _background_loop()).result(timeout)
@@ -4,9 +4,12 @@ OpenRouter provides stable access to many open-source models
 Requires OpenRouter API key (free tier available)
 """
 
-import requests
 import json
 
+import http_client
+import request_trace
+
+@request_trace.traced
 def query_openrouter(prompt, model="mistralai/mistral-7b-instruct"):
     """
     Query Hugging Face models through OpenRouter
@@ -33,8 +36,8 @@ def query_openrouter(prompt, model="mistralai/mistral-7b-instruct"):
     }
     
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
+        response = http_client.post(
+            http_client.OPENROUTER_URL,
             headers=headers,
             json=payload,
             timeout=60
@@ -49,6 +52,7 @@ def query_openrouter(prompt, model="mistralai/mistral-7b-instruct"):
         return f"Exception: {str(e)}"
 
 
+@request_trace.traced
 def query_together_ai(prompt):
     """
     Query using Together AI (another Hugging Face model provider)
@@ -72,8 +76,8 @@ def query_together_ai(prompt):
     }
     
     try:
-        response = requests.post(
-            "https://api.together.xyz/v1/chat/completions",
+        response = http_client.post(
+            http_client.TOGETHER_URL,
             headers=headers,
             json=payload,
             timeout=60
@@ -88,6 +92,7 @@ def query_together_ai(prompt):
         return f"Exception: {str(e)}"
 
 
+@request_trace.traced
 def query_groq_api(prompt):
     """
     Query using Groq API (very fast inference)
@@ -111,8 +116,8 @@ def query_groq_api(prompt):
     }
     
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+        response = http_client.post(
+            http_client.GROQ_URL,
             headers=headers,
             json=payload,
             timeout=60
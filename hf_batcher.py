@@ -0,0 +1,197 @@
+"""
+Micro-batching for Hugging Face Inference calls
+Concurrent calls for the same model (and parameters) that arrive within a
+few milliseconds are merged into one request with a list of `inputs`, and
+each caller gets back a response for its own input, as if it had been sent
+alone. Fewer HTTP requests and less per-call overhead at high QPS.
+
+The first caller of a batch waits up to the window (or until the batch is
+full) and sends it; the others just wait for their slice, so no background
+thread is needed. If the endpoint rejects lists or answers with the wrong
+number of results, the inputs are re-sent one by one.
+
+Environment:
+    HF_BATCH_WINDOW_MS  batching window in ms (unset or 0 = batching off)
+    HF_BATCH_MAX        largest batch (default 16)
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_client
+
+WINDOW = float(os.getenv("HF_BATCH_WINDOW_MS", "0")) / 1000.0
+MAX_BATCH = int(os.getenv("HF_BATCH_MAX", "16"))
+
+# Statuses that mean "no lists here" rather than a real failure
+UNBATCHABLE = {400, 413, 422}
+
+
+class BatchedResponse:
+    """
+    One caller's share of a batched response (requests-like interface)
+    """
+
+    from_cache = False
+
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {"Content-Type": "application/json"}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error: {self.text[:200]}", response=self)
+
+    def close(self):
+        pass
+
+
+class _Batch:
+    def __init__(self):
+        self.inputs = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.responses = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Merge concurrent single-input requests into list requests
+
+    Args:
+        window (float): Seconds the first caller waits for others
+        max_batch (int): Send as soon as this many inputs are queued
+    """
+
+    def __init__(self, window=0.005, max_batch=16):
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = 0
+        self.inputs = 0
+        self.fallbacks = 0
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        """
+        Same call and return shape as http_client.post for a single input
+        """
+        key = (url, (headers or {}).get("Authorization"),
+               _dumps(json.get("parameters")), _dumps(json.get("options")), timeout)
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            index = len(batch.inputs)
+            batch.inputs.append(json["inputs"])
+            if len(batch.inputs) >= self.max_batch:
+                del self._open[key]
+                batch.full.set()
+
+        if not leader:
+            batch.done.wait()
+        else:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            try:
+                batch.responses = self._send(url, headers, json, batch.inputs, timeout)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.responses[index]
+
+    def _send(self, url, headers, payload, inputs, timeout):
+        with self._lock:
+            self.requests += 1
+            self.inputs += len(inputs)
+        if len(inputs) == 1:
+            return [http_client.post(url, headers=headers, json=payload, timeout=timeout)]
+
+        response = http_client.post(url, headers=headers, json=dict(payload, inputs=inputs), timeout=timeout)
+        if response.status_code == 200:
+            body = response.json()
+            if isinstance(body, list) and len(body) == len(inputs):
+                # A single input yields [{"generated_text": ...}]; keep that shape
+                return [BatchedResponse(200, _dumps(item if isinstance(item, list) else [item]).encode())
+                        for item in body]
+        elif response.status_code not in UNBATCHABLE:
+            # A real failure (auth, overload, ...) applies to every caller
+            return [BatchedResponse(response.status_code, response.content, dict(response.headers))
+                    for _ in inputs]
+
+        # The endpoint doesn't take lists: send the inputs one by one
+        with self._lock:
+            self.fallbacks += 1
+            self.requests += len(inputs)
+        with ThreadPoolExecutor(max_workers=len(inputs)) as pool:
+            return list(pool.map(
+                lambda item: http_client.post(url, headers=headers, json=dict(payload, inputs=item), timeout=timeout),
+                inputs,
+            ))
+
+    def stats(self):
+        return {"requests": self.requests, "inputs": self.inputs, "fallbacks": self.fallbacks,
+                "inputs_per_request": self.inputs / self.requests if self.requests else 0.0}
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """
+    Return the shared batcher, or None when batching is off
+    """
+    global _batcher
+    if WINDOW <= 0:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(WINDOW, MAX_BATCH)
+    return _batcher
+
+
+def configure(window_ms=None, max_batch=None):
+    """Turn batching on (window_ms > 0) or off (0) at runtime"""
+    global WINDOW, MAX_BATCH, _batcher
+    with _batcher_lock:
+        if window_ms is not None:
+            WINDOW = window_ms / 1000.0
+        if max_batch is not None:
+            MAX_BATCH = max_batch
+        _batcher = None
+
+
+def post(url, headers=None, json=None, timeout=None):
+    """
+    http_client.post for Hugging Face inference, batched when enabled
+    """
+    batcher = get_batcher()
+    if batcher is None or not isinstance((json or {}).get("inputs"), str):
+        return http_client.post(url, headers=headers, json=json, timeout=timeout)
+    return batcher.post(url, headers=headers, json=json, timeout=timeout)
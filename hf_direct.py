@@ -2,17 +2,22 @@
 Hugging Face Inference API - Simple Direct Calls
 """
 
-import requests
 import json
 
+import hf_batcher
+import http_client
+import request_trace
+from async_client import async_call_huggingface_api, run_prompts
+
+HF_TOKEN = "hf_YOUR_API_TOKEN_HERE"  # Get from .env
+
+@request_trace.traced
 def call_huggingface_api(prompt):
     """
     Call Hugging Face inference API directly
     """
-    HF_TOKEN = "hf_YOUR_API_TOKEN_HERE"  # Get from .env
-    
     # Using Hugging Face's inference endpoint for a specific model
-    API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.3"
+    API_URL = f"{http_client.HF_INFERENCE_URL}/mistralai/Mistral-7B-Instruct-v0.3"
     
     headers = {"Authorization": f"Bearer {HF_TOKEN}"}
     
@@ -25,7 +30,7 @@ def call_huggingface_api(prompt):
     }
     
     try:
-        response = requests.post(API_URL, headers=headers, json=payload, timeout=120)
+        response = hf_batcher.post(API_URL, headers=headers, json=payload, timeout=120)
         if response.status_code == 200:
             result = response.json()
             if isinstance(result, list) and len(result) > 0:
@@ -49,10 +54,12 @@ def main():
         "Write a haiku about programming"
     ]
     
-    for i, prompt in enumerate(prompts, 1):
+    # Send all prompts concurrently, results come back in input order
+    responses = run_prompts(prompts, async_call_huggingface_api, concurrency=4, token=HF_TOKEN)
+    
+    for i, (prompt, response) in enumerate(zip(prompts, responses), 1):
         print(f"\nExample {i}: {prompt[:50]}...")
         print("-" * 70)
-        response = call_huggingface_api(prompt)
         print(f"Response:\n{response}")
         print()
 
@@ -0,0 +1,320 @@
+"""
+Shared HTTP Client Layer for all LLM provider calls
+Keeps pooled keep-alive connections per host so repeated prompts skip
+DNS, TCP and TLS setup. Optional HTTP/2 for the OpenAI-compatible hosts.
+
+Environment:
+    LLM_POOL_SIZE   connections kept alive per host (default 10)
+    LLM_POOL_HOSTS  number of hosts with their own pool (default 10)
+    LLM_HTTP2=1     use HTTP/2 multiplexing for Groq/OpenRouter/Together
+                    (requires: pip install httpx[http2])
+    LLM_MOCK_URL    send every provider to one server, e.g. mock_server.py
+                    at http://127.0.0.1:8000 (paths are kept)
+    OLLAMA_URL, GROQ_URL, OPENROUTER_URL, TOGETHER_URL, HF_INFERENCE_URL,
+    HF_ROUTER_URL   override a single provider endpoint
+"""
+
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+import metrics
+import rate_limit
+import request_trace
+import response_cache
+import single_flight
+import token_budget
+
+MOCK_URL = os.getenv("LLM_MOCK_URL")
+
+
+def _endpoint(name, default):
+    # Per-provider override first, then the mock server (keeping the path)
+    if os.getenv(name):
+        return os.getenv(name).rstrip("/")
+    if MOCK_URL:
+        return MOCK_URL.rstrip("/") + urlsplit(default).path
+    return default
+
+
+# Provider endpoints
+OLLAMA_URL = _endpoint("OLLAMA_URL", "http://localhost:11434")
+GROQ_URL = _endpoint("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+OPENROUTER_URL = _endpoint("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+TOGETHER_URL = _endpoint("TOGETHER_URL", "https://api.together.xyz/v1/chat/completions")
+HF_INFERENCE_URL = _endpoint("HF_INFERENCE_URL", "https://api-inference.huggingface.co/models")
+HF_ROUTER_URL = _endpoint("HF_ROUTER_URL", "https://router.huggingface.co/models")
+
+# Hosts speaking the OpenAI chat API (these also support HTTP/2)
+OPENAI_COMPATIBLE_HOSTS = {"api.groq.com", "openrouter.ai", "api.together.xyz"}
+
+PROVIDER_NAMES = {
+    "api.groq.com": "groq",
+    "openrouter.ai": "openrouter",
+    "api.together.xyz": "together",
+    "api-inference.huggingface.co": "hf",
+    "router.huggingface.co": "hf",
+}
+
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+POOL_HOSTS = int(os.getenv("LLM_POOL_HOSTS", "10"))
+USE_HTTP2 = os.getenv("LLM_HTTP2", "0") == "1"
+
+_lock = threading.Lock()
+_session = None
+_http2_client = None
+
+# Upper bound on per-request timeouts for the current thread / task
+_timeout_cap = contextvars.ContextVar("timeout_cap", default=None)
+
+
+def get_session():
+    """
+    Return the process-wide requests session with per-host connection pools
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = request_trace.TracingHTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_http2_client():
+    """
+    Return the shared HTTP/2 client, or None if httpx[http2] is not installed
+    """
+    global _http2_client, USE_HTTP2
+    if _http2_client is None:
+        with _lock:
+            if _http2_client is None:
+                try:
+                    import httpx
+                    _http2_client = httpx.Client(
+                        http2=True,
+                        limits=httpx.Limits(
+                            max_connections=POOL_SIZE * POOL_HOSTS,
+                            max_keepalive_connections=POOL_SIZE,
+                        ),
+                    )
+                except ImportError:
+                    print("Warning: LLM_HTTP2=1 needs 'pip install httpx[http2]', using HTTP/1.1")
+                    USE_HTTP2 = False
+    return _http2_client
+
+
+def configure(pool_size=None, pool_hosts=None, http2=None):
+    """
+    Change pool settings; existing connections are closed and rebuilt lazily
+
+    Args:
+        pool_size (int): Connections kept alive per host
+        pool_hosts (int): Number of hosts that get their own pool
+        http2 (bool): Use HTTP/2 for the OpenAI-compatible hosts
+    """
+    global POOL_SIZE, POOL_HOSTS, USE_HTTP2
+    close()
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if pool_hosts is not None:
+        POOL_HOSTS = pool_hosts
+    if http2 is not None:
+        USE_HTTP2 = http2
+
+
+def provider_for(url):
+    """
+    Short provider name for a URL ("groq", "openrouter", "together", "hf",
+    "ollama"), falling back to the host name
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if host in PROVIDER_NAMES:
+        return PROVIDER_NAMES[host]
+    # Overridden endpoints (e.g. all on the mock server) are matched by prefix
+    for name, endpoint in (("groq", GROQ_URL), ("openrouter", OPENROUTER_URL), ("together", TOGETHER_URL),
+                           ("hf", HF_INFERENCE_URL), ("hf", HF_ROUTER_URL)):
+        if url.startswith(endpoint):
+            return name
+    if parts.port == 11434 or parts.netloc == urlsplit(OLLAMA_URL).netloc:
+        return "ollama"
+    return host
+
+
+def _uses_http2(url):
+    return USE_HTTP2 and urlsplit(url).hostname in OPENAI_COMPATIBLE_HOSTS
+
+
+@contextlib.contextmanager
+def timeout_cap(seconds):
+    """
+    Give every request made inside the block at most seconds in total
+    
+    Lets callers such as the provider router give up on a slow backend
+    without changing each query function's fixed timeout: each attempt's
+    timeout is cut to the time left, and retries that couldn't finish in
+    time aren't started (rate_limit.deadline).
+    """
+    token = _timeout_cap.set(seconds)
+    try:
+        with rate_limit.deadline(seconds):
+            yield
+    finally:
+        _timeout_cap.reset(token)
+
+
+def _send(method, url, **kwargs):
+    cap = _timeout_cap.get()
+    if cap is not None:
+        cap = max(0.001, min(cap, rate_limit.remaining()))
+        timeout = kwargs.get("timeout")
+        kwargs["timeout"] = cap if timeout is None else min(timeout, cap)
+    trace = request_trace.current()
+    if _uses_http2(url):
+        client = get_http2_client()
+        if client is not None:
+            stream = kwargs.pop("stream", False)
+            if trace is not None:
+                kwargs["extensions"] = {"trace": trace.httpx_hook}
+            response = client.send(client.build_request(method, url, **kwargs), stream=stream)
+            if trace is not None:
+                request_trace.attach(trace, response)
+            return response
+    if trace is None:
+        return get_session().request(method, url, **kwargs)
+    sent_at = time.perf_counter()
+    response = get_session().request(method, url, **kwargs)
+    request_trace.attach(trace, response, sent_at, kwargs.get("stream", False))
+    return response
+
+
+def request(method, url, **kwargs):
+    """
+    Send a request through the shared pools (same arguments as requests)
+    
+    JSON requests are paced and retried per provider (rate_limit), and
+    non-streaming JSON POSTs are served from / stored in the response cache.
+    With LLM_SINGLE_FLIGHT=1, identical JSON requests in flight at the same
+    time share one upstream call. JSON bodies are first fitted to the
+    model's context window (token_budget). Every request is counted and
+    timed in metrics.
+    """
+    provider = provider_for(url)
+    payload = kwargs.get("json")
+    model = metrics.model_for(url, payload)
+    if payload is not None and token_budget.ENABLED:
+        payload = kwargs["json"] = token_budget.preflight(url, payload, provider, model)
+    trace, token = request_trace.begin(method, url, provider)
+    try:
+        stream = kwargs.get("stream", False)
+        cache = response_cache.get_cache() if payload is not None and method == "POST" and not stream else None
+        key = None
+        if cache is not None:
+            key, cached = cache.lookup(url, payload)
+            if cached is not None:
+                if trace is not None:
+                    request_trace.attach(trace, cached)
+                metrics.request_finished(provider, model, "cached", 0.0, cached)
+                return cached
+
+        def fetch():
+            metrics.request_started(provider)
+            started = time.perf_counter()
+            try:
+                if payload is None:
+                    response = _send(method, url, **kwargs)
+                else:
+                    response = rate_limit.send(lambda: _send(method, url, **kwargs), provider, payload, stream)
+            except Exception:
+                metrics.request_finished(provider, model, "exception", time.perf_counter() - started)
+                raise
+            metrics.request_finished(provider, model, response.status_code, time.perf_counter() - started, response)
+
+            if cache is not None:
+                cache.store(key, response)
+            return response
+
+        if payload is None or not single_flight.enabled():
+            return fetch()
+        # Identical requests already in flight are joined instead of repeated
+        started = time.perf_counter()
+        response, shared = single_flight.do(method, url, kwargs, fetch)
+        if shared:
+            waited = time.perf_counter() - started
+            request_trace.record("coalesced", waited)
+            metrics.request_finished(provider, model, "coalesced", waited)
+        return response
+    finally:
+        request_trace.end(trace, token)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def is_error_result(result):
+    """
+    True for the failure values provider functions return
+    (None, or an "Error ..." / "Exception: ..." string)
+    """
+    if result is None:
+        return True
+    return isinstance(result, str) and (result.startswith("Error") or result.startswith("Exception:"))
+
+
+def preconnect(urls=None, timeout=5):
+    """
+    Open pooled connections ahead of the first prompt
+
+    Args:
+        urls (list): URLs whose hosts should be warmed (default: all providers)
+        timeout (int): Seconds to wait for each host
+
+    Returns:
+        list: Hosts that accepted a connection
+    """
+    if urls is None:
+        urls = [OLLAMA_URL, GROQ_URL, OPENROUTER_URL, TOGETHER_URL, HF_INFERENCE_URL]
+
+    origins = []
+    for url in urls:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+        if origin not in origins:
+            origins.append(origin)
+
+    def warm(origin):
+        try:
+            request("HEAD", origin, timeout=timeout)
+            return urlsplit(origin).hostname
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=len(origins) or 1) as pool:
+        return [host for host in pool.map(warm, origins) if host]
+
+
+def close():
+    """Close every pooled connection"""
+    global _session, _http2_client
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _http2_client is not None:
+            _http2_client.close()
+            _http2_client = None
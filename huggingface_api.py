@@ -6,6 +6,11 @@ Requires: pip install requests
 import requests
 import json
 
+import hf_batcher
+import http_client
+import request_trace
+
+@request_trace.traced
 def query_huggingface_router(prompt, model="gpt2", api_token=None):
     """
     Query Hugging Face using new router endpoint
@@ -22,7 +27,7 @@ def query_huggingface_router(prompt, model="gpt2", api_token=None):
     if not api_token:
         raise ValueError("Please provide your HuggingFace API token")
     
-    API_URL = f"https://router.huggingface.co/models/{model}"
+    API_URL = f"{http_client.HF_ROUTER_URL}/{model}"
     headers = {
         "Authorization": f"Bearer {api_token}",
         "Content-Type": "application/json"
@@ -31,7 +36,7 @@ def query_huggingface_router(prompt, model="gpt2", api_token=None):
     payload = {"inputs": prompt}
     
     try:
-        response = requests.post(API_URL, headers=headers, json=payload)
+        response = hf_batcher.post(API_URL, headers=headers, json=payload)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -1,9 +1,16 @@
 """
 Hugging Face Inference API using official SDK
+
+Usage:
+    python huggingface_sdk_api.py [document.txt]   # the document is summarized in Example 3
 """
 
+import sys
+
 from huggingface_hub import InferenceClient
 
+from summarize import Summarizer, hf_summarizer
+
 def main():
     # Initialize the client with your API token
     HF_API_TOKEN = "hf_YOUR_API_TOKEN_HERE"  # Get from .env
@@ -47,11 +54,16 @@ def main():
         applications and their dependencies into isolated containers. 
         This ensures consistency across development, testing, and production environments.
         """
-        output = client.summarization(
-            text,
-            model="facebook/bart-large-cnn"
-        )
-        print(f"Summary: {output}")
+        if len(sys.argv) > 1:
+            # Long documents are chunked, summarized in parallel and reduced
+            with open(sys.argv[1]) as f:
+                text = f.read()
+        summarizer = Summarizer(hf_summarizer(client, model="facebook/bart-large-cnn"))
+        for event in summarizer.stream(text):
+            if not event["final"]:
+                print(f"  level {event['level']} part {event['index'] + 1}/{event['of']}"
+                      f"{' (cached)' if event['cached'] else ''}")
+        print(f"Summary: {event['summary']}")
     except Exception as e:
         print(f"Error: {e}")
 
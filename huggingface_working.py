@@ -4,15 +4,19 @@ The issue: HuggingFace deprecated api-inference.huggingface.co endpoint (HTTP 41
 Solution: Use Groq API instead - extremely fast, free tier available
 """
 
-import requests
 import json
 from dotenv import load_dotenv
 import os
 
+import http_client
+import request_trace
+from async_client import async_call_groq_api, run_prompts
+
 # Load .env file
 load_dotenv()
 
-def call_groq_api(prompt):
+@request_trace.traced
+def call_groq_api(prompt, model="llama-3.3-70b-versatile"):
     """
     Call Groq API - EXTREMELY FAST open-source model inference
     Uses API key from .env file
@@ -31,7 +35,7 @@ def call_groq_api(prompt):
     }
     
     payload = {
-        "model": "llama-3.3-70b-versatile",
+        "model": model,
         "messages": [
             {"role": "user", "content": prompt}
         ],
@@ -40,8 +44,8 @@ def call_groq_api(prompt):
     }
     
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+        response = http_client.post(
+            http_client.GROQ_URL,
             headers=headers,
             json=payload,
             timeout=60
@@ -77,10 +81,12 @@ def main():
         "Write a haiku about programming"
     ]
     
-    for i, prompt in enumerate(test_prompts, 1):
+    # Send all prompts concurrently, results come back in input order
+    results = run_prompts(test_prompts, async_call_groq_api, concurrency=4)
+    
+    for i, (prompt, result) in enumerate(zip(test_prompts, results), 1):
         print(f"\nExample {i}: {prompt[:50]}...")
         print("-" * 70)
-        result = call_groq_api(prompt)
         print(f"Response:\n{result}\n")
 
 
@@ -0,0 +1,232 @@
+"""
+Open-loop Load Generator for saturation testing
+Sends requests at a fixed or Poisson arrival rate whether or not earlier
+ones have finished (like real users), ramping through a list of rates.
+For each step it reports achieved throughput, latency percentiles,
+queueing delay and in-flight concurrency, then marks the saturation knee:
+the first rate the deployment can no longer keep up with.
+
+Queueing delay is the time a request spent waiting rather than being
+served: client-side scheduling lag plus, for Ollama, the part of the
+latency not covered by Ollama's own total_duration.
+
+Usage:
+    python load_test.py --provider ollama --rates 0.5 1 2 4 8 --duration 30
+    python load_test.py --provider groq --rates 1 2 5 10 --fixed --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import async_client
+import http_client
+import response_cache
+from batch_runner import PROVIDERS
+from benchmark import PROMPTS, summarize
+
+
+def arrival_offsets(rate, duration, poisson=True, rng=None):
+    """
+    Send times (seconds from the start of a step) for one rate
+
+    Args:
+        rate (float): Mean requests per second
+        duration (float): Step length in seconds
+        poisson (bool): Exponential gaps (Poisson process) instead of a fixed interval
+        rng (random.Random): Source of randomness for repeatable runs
+    """
+    rng = rng or random.Random()
+    offsets = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate) if poisson else 1.0 / rate
+        if t >= duration:
+            return offsets
+        offsets.append(t)
+
+
+async def _one(query_fn, prompt, scheduled, started_at, kwargs):
+    start = time.perf_counter()
+    try:
+        result = await query_fn(prompt, **kwargs)
+    except Exception as e:
+        result = f"Exception: {str(e)}"
+    end = time.perf_counter()
+
+    latency = end - start
+    queued = start - (started_at + scheduled)
+    if isinstance(result, dict) and result.get("total_duration"):
+        # Time outside Ollama's own processing was spent queued or in transit
+        queued += max(0.0, latency - result["total_duration"] / 1e9)
+    return {"start": start, "end": end, "latency": latency, "queued": queued,
+            "ok": not http_client.is_error_result(result)}
+
+
+async def run_step(query_fn, rate, duration, poisson=True, prompts=PROMPTS,
+                   max_in_flight=1000, drain_timeout=120, seed=None, **kwargs):
+    """
+    Offer `rate` requests/second for `duration` seconds
+
+    Args:
+        query_fn (coroutine function): e.g. async_client.async_query_ollama
+        max_in_flight (int): Arrivals beyond this many outstanding requests
+                             are dropped (counted) to protect the client
+        drain_timeout (float): Seconds to wait for stragglers after the step
+
+    Returns:
+        dict: Offered/achieved rates, error and drop counts, latency and
+              queueing summaries (ms) and mean in-flight requests
+    """
+    rng = random.Random(seed)
+    offsets = arrival_offsets(rate, duration, poisson, rng)
+    started_at = time.perf_counter()
+    tasks = []
+    dropped = 0
+    in_flight = 0
+
+    def landed(_):
+        nonlocal in_flight
+        in_flight -= 1
+
+    for i, offset in enumerate(offsets):
+        delay = started_at + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if in_flight >= max_in_flight:
+            dropped += 1
+            continue
+        prompt = prompts[i % len(prompts)]
+        task = asyncio.create_task(_one(query_fn, prompt, offset, started_at, kwargs))
+        in_flight += 1
+        task.add_done_callback(landed)
+        tasks.append(task)
+
+    done, pending = await asyncio.wait(tasks, timeout=drain_timeout) if tasks else (set(), set())
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    samples = [t.result() for t in done]
+    good = [s for s in samples if s["ok"]]
+
+    elapsed = (max(s["end"] for s in samples) - started_at) if samples else duration
+    # A server that keeps up finishes the last arrival about one service time
+    # after the step ends; measure over the arrival window shifted by that, so
+    # slow but unsaturated requests don't read as lost throughput
+    service = min(s["latency"] for s in good) if good else 0.0
+    span = max(duration, elapsed - service)
+    busy = sum(s["latency"] for s in samples)
+    return {
+        "offered_rps": round(len(offsets) / duration, 3),
+        "throughput_rps": round(len(good) / span, 3) if span > 0 else 0.0,
+        "requests": len(offsets),
+        "errors": len(samples) - len(good),
+        "dropped": dropped,
+        "timed_out": len(pending),
+        "latency_ms": summarize([s["latency"] for s in good], 1000),
+        "queue_ms": summarize([s["queued"] for s in samples], 1000),
+        # Little's law: average number of requests in the system
+        "mean_in_flight": round(busy / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def find_knee(steps, throughput_ratio=0.9, latency_growth=2.0):
+    """
+    First step where throughput falls below throughput_ratio x offered, the
+    p95 latency exceeds latency_growth x the lightest step's, or requests
+    start failing/dropping
+
+    Returns:
+        int: Index into steps, or None if the deployment never saturated
+    """
+    base = None
+    for i, step in enumerate(steps):
+        p95 = (step["latency_ms"] or {}).get("p95")
+        if base is None:
+            base = p95
+        failed = step["errors"] + step["dropped"] + step["timed_out"]
+        if (step["throughput_rps"] < throughput_ratio * step["offered_rps"]
+                or (base and p95 and p95 > latency_growth * base)
+                or failed > 0.05 * max(step["requests"], 1)):
+            return i
+    return None
+
+
+async def ramp(query_fn, rates, duration, poisson=True, pause=2.0, seed=None, **kwargs):
+    """
+    Run one step per rate (lowest first) and locate the knee
+
+    Returns:
+        dict: steps (list), knee_rps and max_sustained_rps / concurrency
+    """
+    steps = []
+    try:
+        for rate in sorted(rates):
+            print(f"Offering {rate} req/s for {duration}s...", file=sys.stderr)
+            step = await run_step(query_fn, rate, duration, poisson, seed=seed, **kwargs)
+            step["rate"] = rate
+            steps.append(step)
+            await asyncio.sleep(pause)  # let queues drain between steps
+    finally:
+        await async_client.aclose()
+
+    knee = find_knee(steps)
+    if knee is None:
+        sustained = steps[-1] if steps else None
+    else:
+        sustained = steps[knee - 1] if knee > 0 else None
+    return {
+        "steps": steps,
+        "knee_rps": steps[knee]["rate"] if knee is not None else None,
+        "max_sustained_rps": sustained["throughput_rps"] if sustained else None,
+        "max_sustained_concurrency": sustained["mean_in_flight"] if sustained else None,
+    }
+
+
+def print_table(report):
+    print(f"{'rate':>7} {'thru/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'queue p95':>10} {'in-flight':>10} {'err':>5} {'drop':>5}")
+    for step in report["steps"]:
+        latency = step["latency_ms"] or {}
+        queue = step["queue_ms"] or {}
+        marker = "  <- knee" if step["rate"] == report["knee_rps"] else ""
+        print(f"{step['rate']:>7} {step['throughput_rps']:>8} {latency.get('p50', '-'):>9} "
+              f"{latency.get('p95', '-'):>9} {latency.get('p99', '-'):>9} {queue.get('p95', '-'):>10} "
+              f"{step['mean_in_flight']:>10} {step['errors']:>5} {step['dropped']:>5}{marker}")
+    if report["knee_rps"] is None:
+        print("No saturation within the tested rates")
+    else:
+        print(f"Saturates at {report['knee_rps']} req/s; sustained {report['max_sustained_rps']} req/s "
+              f"with ~{report['max_sustained_concurrency']} requests in flight")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for an LLM provider")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="ollama")
+    parser.add_argument("--model", help="Model name (provider default if omitted)")
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.5, 1, 2, 4, 8], help="Requests/second per step")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per step")
+    parser.add_argument("--fixed", action="store_true", help="Fixed-interval arrivals instead of Poisson")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--seed", type=int, help="Seed for repeatable Poisson arrivals")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Load the provider, not the cache
+    response_cache.configure(enabled=False)
+
+    kwargs = {"model": args.model} if args.model else {}
+    report = asyncio.run(ramp(PROVIDERS[args.provider], args.rates, args.duration, not args.fixed,
+                              seed=args.seed, max_in_flight=args.max_in_flight, **kwargs))
+    report["provider"] = args.provider
+    print_table(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
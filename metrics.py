@@ -0,0 +1,251 @@
+"""
+Metrics Registry with a Prometheus text endpoint
+Request counts by provider/model/status, latency histograms, tokens in/out,
+in-flight gauges, plus cache and rate-limit counters, recorded by the shared
+HTTP chokepoints (http_client.request and async_client.post) so every query
+function is covered.
+
+Recording never takes a lock: each thread writes to its own shard of plain
+dicts and a scrape sums the shards, so the hot path costs a few dict
+updates. Shards of finished threads are folded into a retired shard.
+
+Usage:
+    import metrics
+    metrics.start_http_server(9464)    # GET http://localhost:9464/metrics
+
+Environment:
+    LLM_METRICS=0   turn recording off
+"""
+
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+ENABLED = os.getenv("LLM_METRICS", "1") != "0"
+
+# Latency buckets in seconds (LLM calls run from tens of ms to a minute)
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "llm_requests_total": ("counter", "Requests by provider, model and HTTP status"),
+    "llm_request_duration_seconds": ("histogram", "Request latency until the response (body included unless streamed)"),
+    "llm_tokens_total": ("counter", "Tokens reported by the provider, direction=in (prompt) or out (completion)"),
+    "llm_in_flight_requests": ("gauge", "Requests currently waiting on a provider"),
+    "llm_cache_events_total": ("counter", "Response cache hits, misses, bypasses and evictions"),
+    "llm_rate_limit_events_total": ("counter", "429 pauses and retries per provider"),
+}
+
+_lock = threading.Lock()
+_local = threading.local()
+_shards = []          # (thread, shard) for live threads
+_retired = None
+
+
+class _Shard:
+    """One thread's counters: {(name, labels): value} and histograms"""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf, sum]
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _Shard()
+        _local.shard = shard
+        with _lock:
+            _shards.append((threading.current_thread(), shard))
+    return shard
+
+
+def inc(name, labels, value=1):
+    """Add value to a counter (or gauge, with a negative value)"""
+    counters = _shard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, labels, seconds):
+    """Record one histogram sample"""
+    histograms = _shard().histograms
+    key = (name, labels)
+    row = histograms.get(key)
+    if row is None:
+        row = histograms[key] = [0] * (len(BUCKETS) + 2)
+    row[bisect.bisect_left(BUCKETS, seconds)] += 1
+    row[-1] += seconds
+
+
+def model_for(url, payload):
+    """Model name from the JSON body, or from the URL for Hugging Face"""
+    if payload and payload.get("model"):
+        return str(payload["model"])
+    path = urlsplit(url).path
+    return path.split("/models/", 1)[1] if "/models/" in path else ""
+
+
+def request_started(provider):
+    if ENABLED:
+        inc("llm_in_flight_requests", (("provider", provider),))
+
+
+def request_finished(provider, model, status, seconds, response=None):
+    """
+    Record a finished request; token counts are taken from the body when
+    the caller decodes it, so the response is never parsed twice
+
+    Args:
+        status: HTTP status code, "cached", "coalesced", "exception" or "cancelled"
+    """
+    if not ENABLED:
+        return
+    if status not in ("cached", "coalesced"):
+        # Those never went upstream, so request_started() wasn't called
+        inc("llm_in_flight_requests", (("provider", provider),), -1)
+    inc("llm_requests_total", (("provider", provider), ("model", model), ("status", str(status))))
+    if status != "cached":
+        observe("llm_request_duration_seconds", (("provider", provider), ("model", model)), seconds)
+    if response is not None and status == 200:
+        # Cached responses were never sent to the provider, so their tokens don't count
+        _count_tokens_on_decode(response, provider, model)
+
+
+def _count_tokens_on_decode(response, provider, model):
+    original = response.json
+
+    def counted_json(*args, **kwargs):
+        body = original(*args, **kwargs)
+        if isinstance(body, dict):
+            usage = body.get("usage")
+            if isinstance(usage, dict):
+                tokens_in, tokens_out = usage.get("prompt_tokens"), usage.get("completion_tokens")
+            else:
+                tokens_in, tokens_out = body.get("prompt_eval_count"), body.get("eval_count")
+            if tokens_in:
+                inc("llm_tokens_total", (("provider", provider), ("model", model), ("direction", "in")), tokens_in)
+            if tokens_out:
+                inc("llm_tokens_total", (("provider", provider), ("model", model), ("direction", "out")), tokens_out)
+        return body
+
+    response.json = counted_json
+
+
+def _collect():
+    # Sum every shard; shards of finished threads are merged into _retired
+    global _retired
+    with _lock:
+        live = []
+        for thread, shard in _shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _retired = _merge(_retired or _Shard(), shard)
+        _shards[:] = live
+        shards = [shard for _, shard in live] + ([_retired] if _retired else [])
+
+    total = _Shard()
+    for shard in shards:
+        _merge(total, shard)
+    return total
+
+
+def _merge(into, shard):
+    for key, value in dict(shard.counters).items():
+        into.counters[key] = into.counters.get(key, 0) + value
+    for key, row in dict(shard.histograms).items():
+        row = list(row)
+        current = into.histograms.get(key)
+        into.histograms[key] = row if current is None else [a + b for a, b in zip(current, row)]
+    return into
+
+
+def _external_counters():
+    # Counters kept by other modules, read at scrape time
+    import rate_limit
+    import response_cache
+
+    counters = {}
+    cache = response_cache._cache  # don't open the cache just to scrape it
+    if cache is not None:
+        for event in ("hits", "misses", "bypassed", "evictions"):
+            counters[("llm_cache_events_total", (("event", event),))] = getattr(cache, event, 0)
+    for provider, limiter in list(rate_limit._limiters.items()):
+        counters[("llm_rate_limit_events_total", (("provider", provider), ("event", "throttled")))] = limiter.throttled
+        counters[("llm_rate_limit_events_total", (("provider", provider), ("event", "retry")))] = limiter.retries
+    return counters
+
+
+def _labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """
+    Current metrics in the Prometheus text exposition format
+    """
+    total = _collect()
+    counters = dict(total.counters)
+    counters.update(_external_counters())
+
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for (name, labels), row in total.histograms.items():
+        by_name.setdefault(name, []).append((labels, row))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, ('le', str(bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep scrapes out of the service's output
+
+
+def start_http_server(port=9464, addr="0.0.0.0"):
+    """
+    Serve /metrics from a daemon thread
+
+    Returns:
+        ThreadingHTTPServer: call .shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-metrics", daemon=True).start()
+    return server
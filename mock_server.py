@@ -0,0 +1,353 @@
+"""
+Local Stand-in Server for Ollama and OpenAI-compatible APIs
+A dependency-free asyncio HTTP/1.1 server (keep-alive, chunked streaming)
+for offline testing and deterministic benchmarks. It speaks:
+
+    GET  /api/tags, /api/ps              Ollama model list / running models
+    POST /api/generate, /api/chat        Ollama generation (NDJSON streaming)
+    POST /api/embed                      Ollama embeddings (bag-of-words hash)
+    POST .../chat/completions            OpenAI shape, SSE when stream=true
+    POST /models/<model>                 Hugging Face inference (list inputs ok)
+
+Token rate, time-to-first-token and error injection (429 / 500 / hung
+requests) are configurable.
+
+Usage:
+    python mock_server.py --port 8000 --tokens-per-sec 50 --ttft 0.2 --error-429 0.05
+    LLM_MOCK_URL=http://127.0.0.1:8000 python huggingface_working.py
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+
+WORDS = ("the quick brown fox jumps over a lazy dog while containers ship code "
+         "across clusters and models answer questions").split()
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests",
+           500: "Internal Server Error"}
+
+
+class MockConfig:
+    """
+    Behaviour of the mock server
+
+    Args:
+        tokens_per_sec (float): Generation speed after the first token
+        ttft (float): Seconds before the first token
+        max_tokens (int): Tokens generated when the request sets no limit
+        error_429, error_500, timeout_rate (float): Injection probabilities
+        hang_seconds (float): How long an injected timeout holds the request
+        parallel (int): Generations served at once, others queue (0 = unlimited),
+                        like OLLAMA_NUM_PARALLEL
+        models (list): Model names reported by /api/tags
+        embed_dim (int): Embedding dimension for /api/embed
+        seed (int): Random seed for error injection
+    """
+
+    def __init__(self, tokens_per_sec=50.0, ttft=0.2, max_tokens=64, error_429=0.0, error_500=0.0,
+                 timeout_rate=0.0, hang_seconds=3600.0, parallel=0, models=None, embed_dim=384, seed=None):
+        self.tokens_per_sec = tokens_per_sec
+        self.ttft = ttft
+        self.max_tokens = max_tokens
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.parallel = parallel
+        self.models = models or ["mistral:latest", "llama3.1:8b", "nomic-embed-text:latest"]
+        self.embed_dim = embed_dim
+        self.random = random.Random(seed)
+
+
+class MockServer:
+    """
+    Asyncio server implementing the endpoints listed in the module docstring
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=8000):
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.active = 0
+        self.loaded = {}  # model -> expiry (Ollama keep_alive bookkeeping)
+        self._server = None
+        self._slots = None
+
+    async def start(self):
+        if self.config.parallel > 0:
+            self._slots = asyncio.Semaphore(self.config.parallel)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Mock LLM server listening on http://{self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # -- HTTP plumbing -------------------------------------------------
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                self.requests += 1
+                self.active += 1
+                try:
+                    await self._dispatch(method, path.split("?", 1)[0], body, writer)
+                finally:
+                    self.active -= 1
+                if headers.get("connection", "").lower() == "close":
+                    return
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send_json(self, writer, status, obj, extra_headers=None):
+        data = json.dumps(obj).encode()
+        head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+        for name, value in (extra_headers or {}).items():
+            head += f"{name}: {value}\r\n"
+        head += f"Content-Length: {len(data)}\r\n\r\n"
+        writer.write(head.encode() + data)
+        await writer.drain()
+
+    async def _start_chunked(self, writer, content_type):
+        writer.write(
+            f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nTransfer-Encoding: chunked\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+    async def _chunk(self, writer, data):
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+
+    # -- Behaviour -----------------------------------------------------
+
+    async def _inject_error(self, writer):
+        # Returns True when an error response was sent instead of the real one
+        cfg = self.config
+        roll = cfg.random.random()
+        if roll < cfg.timeout_rate:
+            await asyncio.sleep(cfg.hang_seconds)
+            return True
+        roll -= cfg.timeout_rate
+        if roll < cfg.error_429:
+            await self._send_json(writer, 429, {"error": "rate limit exceeded"}, {"Retry-After": "1"})
+            return True
+        roll -= cfg.error_429
+        if roll < cfg.error_500:
+            await self._send_json(writer, 500, {"error": "injected server error"})
+            return True
+        return False
+
+    def _tokens(self, limit):
+        n = int(limit) if limit and int(limit) > 0 else self.config.max_tokens
+        return [WORDS[i % len(WORDS)] + " " for i in range(n)]
+
+    async def _wait_for(self, tokens):
+        # Non-streaming: one sleep for the whole generation time
+        rate = self.config.tokens_per_sec
+        await asyncio.sleep(self.config.ttft + (max(len(tokens) - 1, 0) / rate if rate > 0 else 0.0))
+        return "".join(tokens)
+
+    async def _generate(self, tokens):
+        # Yield tokens at the configured TTFT and rate
+        await asyncio.sleep(self.config.ttft)
+        interval = 1.0 / self.config.tokens_per_sec if self.config.tokens_per_sec > 0 else 0.0
+        started = time.perf_counter()
+        for i, token in enumerate(tokens):
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield token
+
+    def _embed(self, text):
+        # Bag-of-words hashing so texts sharing words get similar vectors
+        vector = [0.0] * self.config.embed_dim
+        for word in str(text).lower().split():
+            digest = hashlib.md5(word.strip(".,?!").encode()).digest()
+            index = int.from_bytes(digest[:4], "little") % self.config.embed_dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    async def _dispatch(self, method, path, body, writer):
+        try:
+            payload = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            await self._send_json(writer, 400, {"error": "invalid JSON"})
+            return
+
+        if method in ("GET", "HEAD") and path in ("/", "/api/version"):
+            await self._send_json(writer, 200, {"version": "mock"})
+        elif method == "GET" and path == "/api/tags":
+            await self._send_json(writer, 200, {"models": [{"name": m, "model": m} for m in self.config.models]})
+        elif method == "GET" and path == "/api/ps":
+            now = time.time()
+            self.loaded = {m: exp for m, exp in self.loaded.items() if exp is None or exp > now}
+            await self._send_json(writer, 200, {"models": [{"name": m, "model": m} for m in self.loaded]})
+        elif method != "POST":
+            await self._send_json(writer, 404, {"error": f"no route for {method} {path}"})
+        elif await self._inject_error(writer):
+            return
+        elif path in ("/api/generate", "/api/chat") or path.endswith("/chat/completions") or path.startswith("/models/"):
+            if self._slots is None:
+                await self._generation(path, payload, writer)
+            else:
+                async with self._slots:
+                    await self._generation(path, payload, writer)
+        elif path in ("/api/embed", "/api/embeddings"):
+            texts = payload.get("input", payload.get("prompt", ""))
+            texts = texts if isinstance(texts, list) else [texts]
+            await self._send_json(writer, 200, {"model": payload.get("model"),
+                                                "embeddings": [self._embed(t) for t in texts]})
+        else:
+            await self._send_json(writer, 404, {"error": f"no route for {method} {path}"})
+
+    async def _generation(self, path, payload, writer):
+        if path in ("/api/generate", "/api/chat"):
+            await self._ollama_generate(path, payload, writer)
+        elif path.startswith("/models/"):
+            await self._hf_inference(payload, writer)
+        else:
+            await self._chat_completion(payload, writer)
+
+    async def _ollama_generate(self, path, payload, writer):
+        model = payload.get("model", "mistral")
+        keep_alive = payload.get("keep_alive", "5m")
+        self.loaded[model] = None if keep_alive in (-1, "-1") else time.time() + 300
+        if keep_alive in (0, "0"):
+            self.loaded.pop(model, None)
+
+        prompt = payload.get("prompt") or " ".join(m.get("content", "") for m in payload.get("messages", []))
+        tokens = self._tokens((payload.get("options") or {}).get("num_predict"))
+        if not prompt:
+            tokens = []  # Ollama treats an empty prompt as a load request
+        started = time.perf_counter()
+        context = list(payload.get("context") or []) + list(range(len(prompt.split()) + len(tokens)))
+
+        def final():
+            elapsed = int((time.perf_counter() - started) * 1e9)
+            frame = {
+                "model": model, "done": True, "done_reason": "stop",
+                "total_duration": elapsed, "load_duration": 0,
+                "prompt_eval_count": len(prompt.split()), "prompt_eval_duration": int(self.config.ttft * 1e9),
+                "eval_count": len(tokens), "eval_duration": max(0, elapsed - int(self.config.ttft * 1e9)),
+            }
+            if path == "/api/generate":
+                frame["response"] = ""
+                frame["context"] = context
+            else:
+                frame["message"] = {"role": "assistant", "content": ""}
+            return frame
+
+        def piece(text):
+            if path == "/api/generate":
+                return {"model": model, "response": text, "done": False}
+            return {"model": model, "message": {"role": "assistant", "content": text}, "done": False}
+
+        if payload.get("stream", True):
+            await self._start_chunked(writer, "application/x-ndjson")
+            async for token in self._generate(tokens):
+                await self._chunk(writer, json.dumps(piece(token)).encode() + b"\n")
+            await self._chunk(writer, json.dumps(final()).encode() + b"\n")
+            await self._chunk(writer, b"")
+        else:
+            text = await self._wait_for(tokens)
+            frame = final()
+            if path == "/api/generate":
+                frame["response"] = text
+            else:
+                frame["message"]["content"] = text
+            await self._send_json(writer, 200, frame)
+
+    async def _chat_completion(self, payload, writer):
+        model = payload.get("model", "mock")
+        messages = payload.get("messages", [])
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        tokens = self._tokens(payload.get("max_tokens"))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        frame_id = f"chatcmpl-mock-{self.requests}"
+
+        if payload.get("stream"):
+            await self._start_chunked(writer, "text/event-stream")
+            async for token in self._generate(tokens):
+                frame = {"id": frame_id, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                await self._chunk(writer, b"data: " + json.dumps(frame).encode() + b"\n\n")
+            frame = {"id": frame_id, "model": model, "usage": usage,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "length"}]}
+            await self._chunk(writer, b"data: " + json.dumps(frame).encode() + b"\n\n")
+            await self._chunk(writer, b"data: [DONE]\n\n")
+            await self._chunk(writer, b"")
+        else:
+            text = await self._wait_for(tokens)
+            await self._send_json(writer, 200, {
+                "id": frame_id, "object": "chat.completion", "model": model, "usage": usage,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "length"}],
+            })
+
+    async def _hf_inference(self, payload, writer):
+        inputs = payload.get("inputs", "")
+        limit = (payload.get("parameters") or {}).get("max_new_tokens")
+        text = await self._wait_for(self._tokens(limit))
+        if isinstance(inputs, list):
+            result = [[{"generated_text": f"{item} {text}"}] for item in inputs]
+        else:
+            result = [{"generated_text": f"{inputs} {text}"}]
+        await self._send_json(writer, 200, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama / OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--max-tokens", type=int, default=64, help="Tokens when the request sets no limit")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--error-500", type=float, default=0.0, help="Probability of a 500 response")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Probability of a hung request")
+    parser.add_argument("--parallel", type=int, default=0, help="Concurrent generations (0 = unlimited)")
+    parser.add_argument("--seed", type=int, help="Random seed for error injection")
+    args = parser.parse_args()
+
+    config = MockConfig(args.tokens_per_sec, args.ttft, args.max_tokens, args.error_429,
+                        args.error_500, args.timeout_rate, parallel=args.parallel, seed=args.seed)
+    try:
+        asyncio.run(MockServer(config, args.host, args.port).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,88 @@
 """
 Ollama Local LLM API Example
 Requires: docker pull ollama/ollama and ollama run mistral (or other models)
+
+Runtime options tuned by ollama_autotune.py are read from OLLAMA_PROFILE
+(default .ollama_profile.json) and sent automatically for that host/model.
 """
 
 import requests
 import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import http_client
+import request_trace
+
+PROFILE_PATH = os.getenv("OLLAMA_PROFILE", ".ollama_profile.json")
+
+_profile_lock = threading.Lock()
+_profiles = None
+
+
+def load_profiles(reload=False):
+    """
+    Tuned options per Ollama host and model ({} if no profile was written)
+    """
+    global _profiles
+    if _profiles is None or reload:
+        with _profile_lock:
+            try:
+                with open(PROFILE_PATH) as f:
+                    _profiles = json.load(f)
+            except (OSError, ValueError):
+                _profiles = {}
+    return _profiles
+
+
+def tuned_options(model, options=None, host=None):
+    """
+    Options from the host's profile for model, overridden by options
+    """
+    host = load_profiles().get(urlsplit(host or http_client.OLLAMA_URL).netloc, {})
+    entry = host.get(model) or host.get(model if ":" in model else f"{model}:latest") or {}
+    merged = dict(entry.get("options", {}))
+    merged.update(options or {})
+    return merged
+
 
-def query_ollama(prompt, model="mistral"):
+@request_trace.traced
+def query_ollama(prompt, model="mistral", keep_alive=None, context=None, options=None, host=None):
     """
     Query local Ollama instance
     
     Args:
         prompt (str): The input text/prompt
         model (str): Model name installed in Ollama
+        keep_alive (str or int): How long Ollama keeps the model loaded
+                                 afterwards ("10m", -1 = forever, 0 = unload)
+        context (list): "context" from the previous response, so Ollama
+                        continues that conversation without re-reading it
+        options (dict): Runtime options (num_ctx, num_thread, ...) on top of
+                        the tuned profile
+        host (str): Ollama base URL (default http_client.OLLAMA_URL)
     
     Returns:
-        dict: Response from Ollama
+        dict: Response from Ollama (its "context" continues the conversation)
     """
     
-    OLLAMA_URL = "http://localhost:11434/api/generate"
-    
     payload = {
         "model": model,
         "prompt": prompt,
         "stream": False
     }
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    if context:
+        payload["context"] = list(context)
+    options = tuned_options(model, options, host)
+    if options:
+        payload["options"] = options
     
     try:
-        response = requests.post(OLLAMA_URL, json=payload, timeout=60)
+        response = http_client.post(f"{host or http_client.OLLAMA_URL}/api/generate", json=payload, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.ConnectionError:
@@ -40,10 +95,131 @@ def query_ollama(prompt, model="mistral"):
         return None
 
 
-def list_models():
-    """List available models in Ollama"""
+class OllamaStream:
+    """
+    Token iterator over a streaming /api/generate response
+    
+    Iterate to receive tokens as Ollama generates them. Breaking out of the
+    loop, calling close() or leaving a `with` block closes the connection,
+    which makes Ollama stop generating.
+    
+    Attributes:
+        time_to_first_token (float): Seconds from request to first token
+        stats (dict): Final frame (eval_count, eval_duration, ...) once done
+    """
+    
+    def __init__(self, response, started):
+        self._response = response
+        self._started = started
+        self.time_to_first_token = None
+        self.stats = None
+    
+    def __iter__(self):
+        try:
+            for line in self._response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+                
+                token = chunk.get("response", "")
+                if token and self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - self._started
+                if token:
+                    yield token
+                
+                if chunk.get("done"):
+                    self.stats = chunk
+                    return self.stats
+        finally:
+            self.close()
+    
+    def close(self):
+        """Stop generation and close the connection"""
+        self._response.close()
+    
+    cancel = close
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@request_trace.traced
+def stream_ollama(prompt, model="mistral", options=None, host=None):
+    """
+    Query local Ollama instance and stream tokens as they are generated
+    
+    Args:
+        prompt (str): The input text/prompt
+        model (str): Model name installed in Ollama
+        options (dict): Runtime options on top of the tuned profile
+        host (str): Ollama base URL (default http_client.OLLAMA_URL)
+    
+    Returns:
+        OllamaStream: Token iterator, or None if Ollama is unreachable
+    """
+    
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True
+    }
+    options = tuned_options(model, options, host)
+    if options:
+        payload["options"] = options
+    
+    started = time.perf_counter()
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=10)
+        response = http_client.post(f"{host or http_client.OLLAMA_URL}/api/generate", json=payload, timeout=60, stream=True)
+        response.raise_for_status()
+        return OllamaStream(response, started)
+    except requests.exceptions.ConnectionError:
+        print("Error: Cannot connect to Ollama. Make sure Ollama is running.")
+        return None
+    except requests.exceptions.RequestException as e:
+        print(f"Error: {e}")
+        return None
+
+
+@request_trace.traced
+def embed_ollama(texts, model="nomic-embed-text"):
+    """
+    Embed text(s) with the local Ollama /api/embed endpoint
+    
+    Args:
+        texts (str or list): One text or a list of texts
+        model (str): Embedding model installed in Ollama
+    
+    Returns:
+        list: One embedding (list of floats) per text, or None on error
+    """
+    
+    if isinstance(texts, str):
+        texts = [texts]
+    
+    payload = {
+        "model": model,
+        "input": texts
+    }
+    
+    try:
+        response = http_client.post(f"{http_client.OLLAMA_URL}/api/embed", json=payload, timeout=60)
+        response.raise_for_status()
+        return response.json().get("embeddings")
+    except requests.exceptions.RequestException as e:
+        print(f"Error: {e}")
+        return None
+
+
+@request_trace.traced
+def list_models(host=None):
+    """List available models in Ollama (host: base URL, default OLLAMA_URL)"""
+    try:
+        response = http_client.get(f"{host or http_client.OLLAMA_URL}/api/tags", timeout=10)
         if response.status_code == 200:
             return response.json()
         return None
@@ -51,11 +227,57 @@ def list_models():
         return None
 
 
+@request_trace.traced
+def running_models(host=None):
+    """
+    Models currently loaded in Ollama's memory (/api/ps)
+    
+    Args:
+        host (str): Ollama base URL (default http_client.OLLAMA_URL)
+    
+    Returns:
+        list: Model names, or None if Ollama is unreachable
+    """
+    try:
+        response = http_client.get(f"{host or http_client.OLLAMA_URL}/api/ps", timeout=10)
+        response.raise_for_status()
+        return [m.get("name") or m.get("model") for m in response.json().get("models", [])]
+    except requests.exceptions.RequestException as e:
+        print(f"Error: {e}")
+        return None
+
+
+@request_trace.traced
+def load_model(model, keep_alive="5m"):
+    """
+    Load (or with keep_alive=0, unload) a model without generating anything
+    
+    Args:
+        model (str): Model name installed in Ollama
+        keep_alive (str or int): How long to keep it loaded (-1 = until unloaded)
+    
+    Returns:
+        bool: True if Ollama accepted the request
+    """
+    payload = {"model": model, "keep_alive": keep_alive}
+    try:
+        # No prompt: Ollama only loads/unloads the model. Long timeout for big models.
+        response = http_client.post(f"{http_client.OLLAMA_URL}/api/generate", json=payload, timeout=300)
+        response.raise_for_status()
+        return True
+    except requests.exceptions.RequestException as e:
+        print(f"Error: {e}")
+        return False
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("Ollama Local LLM API Examples")
     print("=" * 60)
     
+    # Warm the connection pool before the first prompt
+    http_client.preconnect([http_client.OLLAMA_URL])
+    
     # Check available models
     print("\nChecking available models...")
     models_info = list_models()
@@ -90,3 +312,16 @@ if __name__ == "__main__":
     result = query_ollama("What is Kubernetes?", model="mistral")
     if result:
         print(json.dumps(result, indent=2))
+    
+    # Example 4: Streaming tokens
+    print("\n" + "=" * 60)
+    print("Example 4: Streaming Response")
+    print("=" * 60)
+    stream = stream_ollama("Write a haiku about containers.", model="mistral")
+    if stream:
+        with stream:
+            for token in stream:
+                print(token, end="", flush=True)
+        print(f"\n\nTime to first token: {stream.time_to_first_token}s")
+        if stream.stats:
+            print(f"Generated {stream.stats.get('eval_count')} tokens in {stream.stats.get('eval_duration', 0) / 1e9:.2f}s")
@@ -0,0 +1,196 @@
+"""
+Ollama Runtime Options Autotuner
+Sweeps num_thread, num_batch and num_ctx against the local Ollama for one
+model and a representative prompt set, measuring prompt-eval and generation
+tokens/sec from Ollama's own timings. Each parameter is tuned in turn while
+keeping the best values found so far.
+
+Output length is left alone by default: a num_predict measured on short
+sample prompts would cut off longer answers to every later query. With
+--cap-predict it is capped just above the longest answers seen (use prompts
+that represent the real workload), so runaway generations can't stall a
+worker.
+
+The result is saved to the per-host profile (OLLAMA_PROFILE, default
+.ollama_profile.json), which query_ollama and stream_ollama read
+automatically.
+
+Usage:
+    python ollama_autotune.py --model mistral
+    python ollama_autotune.py --model mistral --prompts prompts.jsonl --threads 4 8 16
+    python ollama_autotune.py --model mistral --prompts prompts.jsonl --cap-predict
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+import http_client
+import ollama_api
+import response_cache
+from batch_runner import iter_jsonl
+from benchmark import PROMPTS
+
+# Tokens generated per prompt while sweeping, so configurations compare fairly
+SWEEP_PREDICT = 64
+
+# A value must be this much faster to replace the current best (ignores noise)
+MIN_GAIN = 0.03
+
+
+def measure(model, options, prompts, repeats=1):
+    """
+    Run the prompts once with options
+
+    Returns:
+        dict: prompt_tps, eval_tps, seconds (prompt eval + generation),
+              eval_counts, errors; None if every request failed
+    """
+    # The first request may reload the model with the new options; don't time it
+    ollama_api.query_ollama(prompts[0], model=model, options=options)
+
+    prompt_tokens = prompt_seconds = eval_tokens = eval_seconds = 0.0
+    eval_counts = []
+    errors = 0
+    for _ in range(repeats):
+        for prompt in prompts:
+            result = ollama_api.query_ollama(prompt, model=model, options=options)
+            if not result or "eval_count" not in result:
+                errors += 1
+                continue
+            prompt_tokens += result.get("prompt_eval_count", 0)
+            prompt_seconds += result.get("prompt_eval_duration", 0) / 1e9
+            eval_tokens += result["eval_count"]
+            eval_seconds += result.get("eval_duration", 0) / 1e9
+            eval_counts.append(result["eval_count"])
+    if not eval_counts:
+        return None
+    return {
+        "prompt_tps": round(prompt_tokens / prompt_seconds, 2) if prompt_seconds else None,
+        "eval_tps": round(eval_tokens / eval_seconds, 2) if eval_seconds else None,
+        "seconds": round(prompt_seconds + eval_seconds, 3),
+        "eval_counts": eval_counts,
+        "errors": errors,
+    }
+
+
+def candidates(args, prompts):
+    """Values tried for each parameter, in tuning order"""
+    cores = os.cpu_count() or 4
+    threads = args.threads or sorted({max(1, cores // 4), max(1, cores // 2), cores})
+    # Smallest context that fits the longest prompt (~4 chars/token) plus the answer
+    needed = max(len(p) for p in prompts) // 4 + args.max_predict
+    contexts = [c for c in (args.contexts or [1024, 2048, 4096, 8192]) if c >= needed] or [8192]
+    return [
+        ("num_thread", threads),
+        ("num_batch", args.batches or [128, 256, 512, 1024]),
+        ("num_ctx", contexts),
+    ]
+
+
+def tune(model, prompts, sweep, repeats=1, log=sys.stderr):
+    """
+    Coordinate-descent sweep
+
+    Returns:
+        (options, result): Best options (without the sweep's num_predict)
+                           and their measurement
+    """
+    best_options = {"num_predict": SWEEP_PREDICT}
+    best = measure(model, best_options, prompts, repeats)
+    if best is None:
+        raise RuntimeError(f"Ollama returned no results for {model}")
+    print(f"defaults: {best['seconds']}s prompt {best['prompt_tps']} tok/s, gen {best['eval_tps']} tok/s", file=log)
+
+    for name, values in sweep:
+        for value in values:
+            options = dict(best_options, **{name: value})
+            result = measure(model, options, prompts, repeats)
+            if result is None:
+                print(f"{name}={value}: failed", file=log)
+                continue
+            print(f"{name}={value}: {result['seconds']}s prompt {result['prompt_tps']} tok/s, "
+                  f"gen {result['eval_tps']} tok/s", file=log)
+            if result["seconds"] < best["seconds"] * (1 - MIN_GAIN):
+                best, best_options = result, options
+    best_options.pop("num_predict")
+    return best_options, best
+
+
+def cap_predict(model, options, prompts, max_predict):
+    """
+    num_predict a little above the longest natural answer (at most max_predict)
+    """
+    counts = []
+    for prompt in prompts:
+        result = ollama_api.query_ollama(prompt, model=model, options=dict(options, num_predict=max_predict))
+        if result and "eval_count" in result:
+            counts.append(result["eval_count"])
+    if not counts:
+        return max_predict
+    return min(max_predict, int(max(counts) * 1.25) + 16)
+
+
+def save_profile(model, options, result, path=None):
+    """Merge this model's options into the profile for the current Ollama host"""
+    path = path or ollama_api.PROFILE_PATH
+    try:
+        with open(path) as f:
+            profiles = json.load(f)
+    except (OSError, ValueError):
+        profiles = {}
+    host = urlsplit(http_client.OLLAMA_URL).netloc
+    profiles.setdefault(host, {})[model] = {
+        "options": options,
+        "prompt_tps": result["prompt_tps"],
+        "eval_tps": result["eval_tps"],
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(profiles, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    ollama_api.load_profiles(reload=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune Ollama runtime options for this host")
+    parser.add_argument("--model", default="mistral")
+    parser.add_argument("--prompts", help="JSONL file with a 'prompt' field (default: built-in set)")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--threads", type=int, nargs="+", help="num_thread values to try")
+    parser.add_argument("--batches", type=int, nargs="+", help="num_batch values to try")
+    parser.add_argument("--contexts", type=int, nargs="+", help="num_ctx values to try")
+    parser.add_argument("--cap-predict", action="store_true",
+                        help="Also save a num_predict cap measured on these prompts (applies to every call)")
+    parser.add_argument("--max-predict", type=int, default=512, help="Upper bound for --cap-predict")
+    parser.add_argument("--dry-run", action="store_true", help="Print the profile without saving it")
+    args = parser.parse_args()
+
+    prompts = [record.get("prompt", "") for _, record in iter_jsonl(args.prompts)] if args.prompts else PROMPTS
+    prompts = [p for p in prompts if p]
+    if not prompts:
+        sys.exit("No prompts to tune with")
+
+    # Tune against the model, not the cache, and start from untuned defaults
+    response_cache.configure(enabled=False)
+    ollama_api.PROFILE_PATH, profile_path = os.devnull, ollama_api.PROFILE_PATH
+    ollama_api.load_profiles(reload=True)
+
+    options, result = tune(args.model, prompts, candidates(args, prompts), args.repeats)
+    if args.cap_predict:
+        options["num_predict"] = cap_predict(args.model, options, prompts, args.max_predict)
+
+    print(json.dumps({"model": args.model, "options": options,
+                      "prompt_tps": result["prompt_tps"], "eval_tps": result["eval_tps"]}, indent=2))
+    if not args.dry_run:
+        ollama_api.PROFILE_PATH = profile_path
+        print(f"Saved to {save_profile(args.model, options, result, profile_path)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Load Balancing across multiple Ollama hosts
+Spreads query_ollama calls over a pool of Ollama servers:
+    - model affinity: prefer hosts where the model is already loaded
+      (/api/ps), and only use hosts that have it installed (/api/tags)
+    - balancing: least outstanding requests, or power-of-two-choices
+    - health probes in the background; failed hosts are skipped and a
+      failed request is retried once on another host
+    - draining: a host generating much slower than its peers gets no new
+      requests for a while, then is given another chance
+
+Environment:
+    OLLAMA_HOSTS   comma-separated base URLs (default: OLLAMA_URL)
+
+Usage:
+    pool = OllamaPool(["http://gpu1:11434", "http://gpu2:11434"])
+    result = pool.query("What is Docker?", model="mistral")
+"""
+
+import os
+import random
+import statistics
+import threading
+import time
+
+import http_client
+from ollama_api import list_models, query_ollama, running_models
+from ollama_residency import canonical
+from provider_router import ProviderStats
+
+
+class OllamaHost:
+    """
+    One Ollama server and what the pool knows about it
+    """
+
+    def __init__(self, url, alpha=0.2):
+        self.url = url.rstrip("/")
+        self.alpha = alpha
+        self.stats = ProviderStats(alpha=alpha)
+        self.outstanding = 0
+        self.healthy = True
+        self.installed = None      # None until the first probe
+        self.resident = set()
+        self.gen_tps = None        # EWMA of Ollama's eval_count / eval_duration
+        self.draining_until = 0.0
+
+    def record_speed(self, result):
+        duration = result.get("eval_duration") or 0
+        if duration and result.get("eval_count"):
+            rate = result["eval_count"] / (duration / 1e9)
+            self.gen_tps = rate if self.gen_tps is None else self.gen_tps + self.alpha * (rate - self.gen_tps)
+
+    def draining(self):
+        return time.monotonic() < self.draining_until
+
+    def has_model(self, model):
+        return self.installed is None or canonical(model) in self.installed
+
+    def snapshot(self):
+        return dict(self.stats.snapshot(), url=self.url, healthy=self.healthy, draining=self.draining(),
+                    outstanding=self.outstanding, gen_tps=self.gen_tps, resident=sorted(self.resident))
+
+
+class OllamaPool:
+    """
+    Pick an Ollama host per request
+
+    Args:
+        urls (list): Base URLs (default: OLLAMA_HOSTS, else OLLAMA_URL)
+        strategy (str): "least" (fewest outstanding) or "p2c" (power of two choices)
+        probe_interval (float): Seconds between health probes (0 = no probe thread)
+        slow_factor (float): Drain a host generating this many times slower than the median
+        drain_seconds (float): How long a slow host is drained before it is retried
+        max_attempts (int): Hosts tried per request
+        spill (int): Extra outstanding requests tolerated on hosts with the
+                     model loaded before others (which must load it) are used
+    """
+
+    def __init__(self, urls=None, strategy="least", probe_interval=15.0, slow_factor=2.0,
+                 drain_seconds=60.0, max_attempts=2, spill=4):
+        if urls is None:
+            urls = [u.strip() for u in os.getenv("OLLAMA_HOSTS", "").split(",") if u.strip()]
+        self.hosts = [OllamaHost(url) for url in (urls or [http_client.OLLAMA_URL])]
+        self.strategy = strategy
+        self.slow_factor = slow_factor
+        self.drain_seconds = drain_seconds
+        self.max_attempts = max_attempts
+        self.spill = spill
+        self.drains = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if probe_interval:
+            self.probe()
+            threading.Thread(target=self._probe_loop, args=(probe_interval,),
+                             name="ollama-pool-probe", daemon=True).start()
+
+    def probe(self):
+        """Refresh health, installed and loaded models of every host"""
+        for host in self.hosts:
+            info = list_models(host=host.url)
+            host.healthy = info is not None
+            if info is None:
+                continue
+            host.installed = {canonical(m.get("name", "")) for m in info.get("models", [])}
+            running = running_models(host=host.url)
+            if running is not None:
+                host.resident = {canonical(m) for m in running}
+
+    def _probe_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.probe()
+
+    def close(self):
+        self._stop.set()
+
+    def _score(self, host):
+        # Lower is better: queue length weighted by recent latency
+        return (host.outstanding + 1) * (host.stats.ewma_latency or 1.0)
+
+    def pick(self, model, exclude=()):
+        """
+        Choose a host for model and count a request against it
+
+        Returns:
+            OllamaHost
+        """
+        with self._lock:
+            candidates = [h for h in self.hosts if h not in exclude and h.has_model(model)] or \
+                         [h for h in self.hosts if h not in exclude] or list(self.hosts)
+            usable = [h for h in candidates if h.healthy and not h.draining()] or \
+                     [h for h in candidates if h.healthy] or candidates
+            # Model affinity: stay on hosts that already have it loaded unless
+            # they are backed up well beyond the idlest host
+            loaded = [h for h in usable if canonical(model) in h.resident]
+            choices = usable
+            if loaded and (min(h.outstanding for h in loaded)
+                           <= min(h.outstanding for h in usable) + self.spill):
+                choices = loaded
+
+            if self.strategy == "p2c" and len(choices) > 2:
+                host = min(random.sample(choices, 2), key=self._score)
+            else:
+                host = min(choices, key=lambda h: (h.outstanding, h.stats.ewma_latency or 0.0))
+            host.outstanding += 1
+            return host
+
+    def _release(self, host, model, latency, result):
+        ok = result is not None
+        with self._lock:
+            host.outstanding -= 1
+            host.stats.record(latency, ok)
+            if ok:
+                host.resident.add(canonical(model))
+                host.record_speed(result)
+            elif host.stats.consecutive_failures >= 2:
+                host.healthy = False  # the probe brings it back
+        if ok:
+            self._check_slow(host)
+
+    def _check_slow(self, host):
+        # Drain a host whose generation speed falls well behind the others
+        with self._lock:
+            rates = [h.gen_tps for h in self.hosts if h.gen_tps and h.healthy]
+            if len(rates) < 2 or not host.gen_tps or host.draining():
+                return
+            if host.gen_tps * self.slow_factor < statistics.median(rates):
+                host.draining_until = time.monotonic() + self.drain_seconds
+                host.gen_tps = None  # judged afresh when it comes back
+                self.drains += 1
+
+    def query(self, prompt, model="mistral", **kwargs):
+        """
+        query_ollama on the best host, retrying on another host if it fails
+
+        Returns:
+            dict: Response from Ollama, or None if every attempt failed
+        """
+        tried = []
+        result = None
+        for _ in range(min(self.max_attempts, len(self.hosts))):
+            host = self.pick(model, exclude=tried)
+            started = time.perf_counter()
+            result = None
+            try:
+                result = query_ollama(prompt, model=model, host=host.url, **kwargs)
+            finally:
+                self._release(host, model, time.perf_counter() - started, result)
+            if result is not None:
+                return result
+            tried.append(host)
+        return result
+
+    def stats(self):
+        return {"strategy": self.strategy, "drains": self.drains,
+                "hosts": [host.snapshot() for host in self.hosts]}
@@ -0,0 +1,260 @@
+"""
+Ollama Model Residency Manager
+Keeps the right models loaded in Ollama so prompts don't pay a multi-second
+model load. Preloads a configured set at startup, pins hot models with
+keep_alive=-1, tracks what is resident (/api/ps) and schedules requests by
+model: prompts for loaded models go first, and a switch to another model
+only happens when its queue is the oldest or has waited max_wait seconds,
+so a memory-limited box doesn't thrash between models.
+
+Environment:
+    OLLAMA_PRELOAD       comma-separated models to load at startup
+    OLLAMA_PINNED        comma-separated models kept loaded forever
+    OLLAMA_MAX_RESIDENT  models that fit in memory at once (default 1)
+    OLLAMA_KEEP_ALIVE    keep_alive for unpinned models (default "10m")
+
+Usage:
+    residency = ResidencyManager()
+    residency.warm_up()
+    scheduler = ModelScheduler(residency, parallel=2)
+    result = scheduler.query("What is Docker?", model="mistral")
+"""
+
+import collections
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from ollama_api import list_models, load_model, query_ollama, running_models
+
+
+def _env_list(name):
+    return [m.strip() for m in os.getenv(name, "").split(",") if m.strip()]
+
+
+def canonical(model):
+    """Ollama's full model name ("mistral" -> "mistral:latest")"""
+    return model if ":" in model else f"{model}:latest"
+
+
+class ResidencyManager:
+    """
+    Which models are loaded in Ollama, and loading/unloading them
+
+    Args:
+        preload (list): Models to load by warm_up()
+        pinned (list): Models loaded with keep_alive=-1 and never unloaded
+        max_resident (int): How many models fit in memory together
+        keep_alive (str): keep_alive sent with requests for unpinned models
+    """
+
+    def __init__(self, preload=None, pinned=None, max_resident=None, keep_alive=None):
+        pinned = pinned if pinned is not None else _env_list("OLLAMA_PINNED")
+        preload = preload if preload is not None else _env_list("OLLAMA_PRELOAD")
+        self.pinned = [canonical(m) for m in pinned]
+        self.preload = [canonical(m) for m in preload]
+        self.max_resident = max_resident or int(os.getenv("OLLAMA_MAX_RESIDENT", "1"))
+        self.keep_alive = keep_alive or os.getenv("OLLAMA_KEEP_ALIVE", "10m")
+        self.resident = set()
+        self.loads = 0
+        self.unloads = 0
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Installed model names (/api/tags)"""
+        info = list_models() or {}
+        return [m.get("name") for m in info.get("models", [])]
+
+    def refresh(self):
+        """
+        Re-read the loaded models from Ollama (it may have unloaded idle ones)
+
+        Returns:
+            set: Resident model names
+        """
+        running = running_models()
+        with self._lock:
+            if running is not None:
+                self.resident = {canonical(m) for m in running}
+            return set(self.resident)
+
+    def is_resident(self, model):
+        return canonical(model) in self.resident
+
+    def is_pinned(self, model):
+        return canonical(model) in self.pinned
+
+    def keep_alive_for(self, model):
+        return -1 if self.is_pinned(model) else self.keep_alive
+
+    def claim(self, model):
+        """Count model as resident from now on (it is about to be loaded)"""
+        with self._lock:
+            if canonical(model) not in self.resident:
+                self.resident.add(canonical(model))
+                self.loads += 1
+
+    def load(self, model):
+        """Load model now (pinned models stay loaded forever)"""
+        if load_model(model, self.keep_alive_for(model)):
+            self.claim(model)
+            return True
+        return False
+
+    def unload(self, model):
+        """Free model's memory (no-op for pinned models)"""
+        if self.is_pinned(model):
+            return False
+        with self._lock:
+            self.resident.discard(canonical(model))
+        if load_model(model, 0):
+            self.unloads += 1
+            return True
+        return False
+
+    def warm_up(self):
+        """
+        Load pinned models, then preload models while there is room
+
+        Returns:
+            list: Models that were loaded
+        """
+        installed = {canonical(m) for m in self.available()}
+        self.refresh()
+        loaded = []
+        for model in self.pinned + [m for m in self.preload if m not in self.pinned]:
+            if installed and model not in installed:
+                print(f"Warning: {model} is not installed in Ollama (ollama pull {model})")
+                continue
+            pinned = self.is_pinned(model)
+            if not pinned and (self.is_resident(model) or len(self.resident) >= self.max_resident):
+                continue
+            if self.load(model):
+                loaded.append(model)
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            return {"resident": sorted(self.resident), "pinned": list(self.pinned),
+                    "loads": self.loads, "unloads": self.unloads}
+
+
+class ModelScheduler:
+    """
+    Run query_ollama calls grouped by model to avoid reloading models
+
+    Args:
+        residency (ResidencyManager): Tracks what is loaded
+        parallel (int): Requests in flight at once (match OLLAMA_NUM_PARALLEL)
+        max_wait (float): Seconds a request for an unloaded model may wait
+                          before the scheduler switches models for it
+    """
+
+    def __init__(self, residency=None, parallel=2, max_wait=30.0):
+        self.residency = residency or ResidencyManager()
+        self.max_wait = max_wait
+        self.queues = collections.OrderedDict()   # model -> deque of jobs
+        self.in_flight = collections.Counter()
+        self.switches = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, name=f"ollama-scheduler-{i}", daemon=True)
+                         for i in range(parallel)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, prompt, model="mistral", **kwargs):
+        """
+        Queue a prompt
+
+        Returns:
+            Future: Resolves to query_ollama's result
+        """
+        future = Future()
+        model = canonical(model)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is closed")
+            self.queues.setdefault(model, collections.deque()).append((future, prompt, kwargs, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def query(self, prompt, model="mistral", **kwargs):
+        """Blocking query_ollama through the scheduler"""
+        return self.submit(prompt, model, **kwargs).result()
+
+    def _oldest(self, models):
+        return min(models, key=lambda m: self.queues[m][0][3])
+
+    def _next_job(self):
+        # (model, job, model to unload first) or None if nothing may start yet
+        pending = [m for m, q in self.queues.items() if q]
+        if not pending:
+            return None
+        hot = [m for m in pending if self.residency.is_resident(m)]
+        cold = [m for m in pending if not self.residency.is_resident(m)]
+
+        if hot:
+            waited = time.monotonic() - self.queues[self._oldest(cold)][0][3] if cold else 0.0
+            if waited < self.max_wait:
+                return self._take(self._oldest(hot))
+        model = self._oldest(cold)
+
+        # Switching to an unloaded model: make room first if memory is full
+        victim = None
+        if len(self.residency.resident) >= self.residency.max_resident:
+            unpinned = [m for m in self.residency.resident if not self.residency.is_pinned(m)]
+            idle = [m for m in unpinned if not self.in_flight[m]]
+            if unpinned and not idle:
+                return None  # wait for the loaded models' requests to finish
+            if idle:
+                victim = min(idle, key=lambda m: len(self.queues.get(m, ())))
+                self.residency.resident.discard(victim)
+            # Only pinned models are loaded: nothing can be unloaded, so this
+            # one goes over max_resident until the next switch unloads it
+        self.residency.claim(model)
+        self.switches += 1
+        return self._take(model, victim)
+
+    def _take(self, model, victim=None):
+        self.in_flight[model] += 1
+        return model, self.queues[model].popleft(), victim
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not any(self.queues.values()):
+                        return
+                    picked = self._next_job()
+                    if picked is not None:
+                        break
+                    self._cond.wait(timeout=self.max_wait)
+            model, (future, prompt, kwargs, _), victim = picked
+            try:
+                if future.set_running_or_notify_cancel():
+                    if victim is not None:
+                        self.residency.unload(victim)
+                    kwargs.setdefault("keep_alive", self.residency.keep_alive_for(model))
+                    future.set_result(query_ollama(prompt, model=model, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._cond:
+                    self.in_flight[model] -= 1
+                    self._cond.notify_all()
+
+    def close(self, wait=True):
+        """Finish queued prompts and stop the workers"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def stats(self):
+        with self._cond:
+            queued = {m: len(q) for m, q in self.queues.items() if q}
+        return dict(self.residency.stats(), queued=queued, switches=self.switches)
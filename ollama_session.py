@@ -0,0 +1,177 @@
+"""
+Multi-turn Ollama Sessions that reuse the returned context
+/api/generate returns a "context" token array for the conversation so far.
+Sending it back with the next prompt lets Ollama reuse its cached prefix and
+only prefill the new turn, instead of re-reading the whole conversation.
+
+Contexts are stored as compact int arrays and capped per session; when a
+conversation outgrows the cap it restarts from its last few turns as text.
+A SessionStore keeps many sessions (one per user/chat) and evicts the least
+recently used and idle ones.
+
+Usage:
+    session = OllamaSession(model="mistral")
+    session.ask("What is Docker?")
+    session.ask("How is it different from a VM?")   # only this turn is prefilled
+
+    store = SessionStore(max_sessions=200, idle_seconds=1800)
+    store.get("user-42").ask("Hello")
+"""
+
+import array
+import collections
+import threading
+import time
+
+import token_budget
+from ollama_api import query_ollama
+
+
+class OllamaSession:
+    """
+    One conversation with an Ollama model
+
+    Args:
+        model (str): Model name installed in Ollama
+        max_context_tokens (int): Largest context kept (default: half of the
+                                  context window token_budget allows, so the
+                                  next prompt and answer still fit)
+        keep_turns (int): Recent turns replayed as text after a context reset
+    """
+
+    def __init__(self, model="mistral", max_context_tokens=None, keep_turns=4):
+        self.model = model
+        if max_context_tokens is None:
+            max_context_tokens = token_budget.context_window(model, "ollama") // 2
+        self.max_context_tokens = max_context_tokens
+        self.context = array.array("i")
+        self.turns = collections.deque(maxlen=keep_turns)  # (prompt, answer)
+        self.prompt_tokens = 0      # tokens Ollama actually prefilled
+        self.prompt_eval_seconds = 0.0
+        self.resets = 0
+        self.last_used = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _replay_prompt(self, prompt):
+        # Context dropped: carry the recent turns over as plain text
+        history = "".join(f"User: {q}\nAssistant: {a}\n" for q, a in self.turns)
+        return f"{history}User: {prompt}\nAssistant:" if history else prompt
+
+    def ask(self, prompt, **kwargs):
+        """
+        Send the next turn
+
+        Args:
+            prompt (str): The new user message only
+            **kwargs: Passed to query_ollama (e.g. keep_alive)
+
+        Returns:
+            str: The answer, or None on error
+        """
+        with self._lock:
+            self.last_used = time.monotonic()
+            replayed = not self.context and bool(self.turns)
+            text = self._replay_prompt(prompt) if replayed else prompt
+            result = query_ollama(text, model=self.model, context=self.context, **kwargs)
+            if not result:
+                return None
+
+            answer = result.get("response", "")
+            self.turns.append((prompt, answer))
+            self.prompt_tokens += result.get("prompt_eval_count", 0)
+            self.prompt_eval_seconds += result.get("prompt_eval_duration", 0) / 1e9
+
+            context = result.get("context") or []
+            if len(context) > self.max_context_tokens:
+                # Too long to keep: the next turn starts over from self.turns
+                self.context = array.array("i")
+                self.resets += 1
+                if replayed:
+                    # Even the replayed turns no longer fit: replay fewer next time
+                    for _ in range(len(self.turns) // 2):
+                        self.turns.popleft()
+            else:
+                self.context = array.array("i", context)
+            return answer
+
+    def reset(self):
+        """Forget the conversation"""
+        with self._lock:
+            self.context = array.array("i")
+            self.turns.clear()
+
+    def memory_bytes(self):
+        """Approximate memory held by this session"""
+        return (self.context.itemsize * len(self.context)
+                + sum(len(q) + len(a) for q, a in self.turns))
+
+    def stats(self):
+        return {
+            "model": self.model,
+            "context_tokens": len(self.context),
+            "prefilled_tokens": self.prompt_tokens,
+            "prefill_seconds": round(self.prompt_eval_seconds, 3),
+            "resets": self.resets,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+class SessionStore:
+    """
+    Sessions by id with LRU eviction
+
+    Args:
+        max_sessions (int): Sessions kept; the least recently used go first
+        idle_seconds (float): Sessions unused this long are dropped
+        **session_kwargs: Passed to new OllamaSession objects (model=...)
+    """
+
+    def __init__(self, max_sessions=100, idle_seconds=1800, **session_kwargs):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.session_kwargs = session_kwargs
+        self.evictions = 0
+        self._sessions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, **session_kwargs):
+        """Existing session for session_id, or a new one"""
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = OllamaSession(**{**self.session_kwargs, **session_kwargs})
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            return session
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        # Oldest first, so stop at the first session still in use
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "evictions": self.evictions,
+            "memory_bytes": sum(s.memory_bytes() for s in sessions),
+        }
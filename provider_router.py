@@ -0,0 +1,229 @@
+"""
+Latency-aware Provider Router
+Sends each prompt to the currently fastest healthy backend that serves the
+requested model family and fails over to the next one on errors or
+timeouts. Per-backend latency (EWMA + p95), error rate and tokens/sec are
+tracked from live traffic.
+"""
+
+import threading
+import time
+from collections import deque
+
+import http_client
+from api_with_env import query_openrouter, query_together_ai
+from huggingface_working import call_groq_api
+from ollama_api import query_ollama
+
+# Model family -> model name per provider
+MODEL_FAMILIES = {
+    "llama-3.3-70b": {
+        "groq": "llama-3.3-70b-versatile",
+        "openrouter": "meta-llama/llama-3.3-70b-instruct",
+        "together": "meta-llama/Llama-3.3-70B-Instruct-Turbo",
+        "ollama": "llama3.3",
+    },
+    "llama-3.1-8b": {
+        "groq": "llama-3.1-8b-instant",
+        "openrouter": "meta-llama/llama-3.1-8b-instruct",
+        "together": "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo",
+        "ollama": "llama3.1:8b",
+    },
+    "mistral-7b": {
+        "openrouter": "mistralai/mistral-7b-instruct",
+        "together": "mistralai/Mistral-7B-Instruct-v0.2",
+        "ollama": "mistral",
+    },
+}
+
+
+class ProviderStats:
+    """
+    Rolling health and speed figures for one backend
+
+    Args:
+        window (int): Number of recent calls kept for p95 and error rate
+        alpha (float): EWMA smoothing factor
+    """
+
+    def __init__(self, window=100, alpha=0.2):
+        self.alpha = alpha
+        self.ewma_latency = None
+        self.tokens_per_sec = None
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok, tokens=None):
+        with self._lock:
+            self.outcomes.append(ok)
+            if not ok:
+                self.consecutive_failures += 1
+                return
+            self.consecutive_failures = 0
+            self.latencies.append(latency)
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency += self.alpha * (latency - self.ewma_latency)
+            if tokens and latency > 0:
+                rate = tokens / latency
+                if self.tokens_per_sec is None:
+                    self.tokens_per_sec = rate
+                else:
+                    self.tokens_per_sec += self.alpha * (rate - self.tokens_per_sec)
+
+    def p95(self):
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def error_rate(self):
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self):
+        return {
+            "ewma_latency": self.ewma_latency,
+            "p95_latency": self.p95(),
+            "error_rate": self.error_rate(),
+            "tokens_per_sec": self.tokens_per_sec,
+            "calls": len(self.outcomes),
+        }
+
+
+class Backend:
+    """
+    One provider function plus the model it uses for each family
+
+    Args:
+        name (str): Provider name (key into MODEL_FAMILIES)
+        query_fn (callable): query_fn(prompt, model=...) provider function
+        extract (callable): Turns query_fn's result into (text, output tokens)
+    """
+
+    def __init__(self, name, query_fn, extract=None):
+        self.name = name
+        self.query_fn = query_fn
+        self.extract = extract or (lambda result: (result, len(result) // 4))
+        self.stats = ProviderStats()
+
+    def model_for(self, family):
+        return MODEL_FAMILIES.get(family, {}).get(self.name)
+
+
+def _extract_ollama(result):
+    return result.get("response", ""), result.get("eval_count")
+
+
+def default_backends():
+    """Groq, OpenRouter, Together AI and local Ollama"""
+    return [
+        Backend("groq", call_groq_api),
+        Backend("openrouter", query_openrouter),
+        Backend("together", query_together_ai),
+        Backend("ollama", query_ollama, extract=_extract_ollama),
+    ]
+
+
+class ProviderRouter:
+    """
+    Route prompts to the fastest healthy backend, failing over on errors
+
+    Args:
+        backends (list): Backend objects (default: default_backends())
+        max_error_rate (float): Backends above this error rate are tried last
+        failures_before_cooldown (int): Consecutive failures that bench a backend
+        cooldown (float): Seconds a benched backend is tried last
+        timeout_factor (float): Per-call timeout = p95 x factor ...
+        min_timeout, max_timeout (float): ... clamped to this range
+    """
+
+    def __init__(self, backends=None, max_error_rate=0.5, failures_before_cooldown=3,
+                 cooldown=30.0, timeout_factor=3.0, min_timeout=5.0, max_timeout=60.0):
+        self.backends = backends if backends is not None else default_backends()
+        self.max_error_rate = max_error_rate
+        self.failures_before_cooldown = failures_before_cooldown
+        self.cooldown = cooldown
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+    def healthy(self, backend):
+        """Not benched and below the error-rate ceiling"""
+        stats = backend.stats
+        return time.monotonic() >= stats.cooldown_until and stats.error_rate() <= self.max_error_rate
+
+    def candidates(self, family):
+        """
+        Backends serving `family`, best first
+
+        Benched backends go last, then those over the error-rate ceiling
+        (they still get a call when everything ahead of them fails, which
+        is how they recover). Untried backends go first so every backend
+        gets measured, then lowest EWMA latency wins.
+        """
+        now = time.monotonic()
+        serving = [b for b in self.backends if b.model_for(family)]
+        return sorted(serving, key=lambda b: (
+            not self.healthy(b),
+            now < b.stats.cooldown_until,
+            b.stats.ewma_latency is not None,
+            b.stats.ewma_latency or 0.0,
+        ))
+
+    def timeout_for(self, backend):
+        p95 = backend.stats.p95()
+        if p95 is None:
+            return self.max_timeout
+        return max(self.min_timeout, min(self.max_timeout, p95 * self.timeout_factor))
+
+    def route(self, prompt, family="llama-3.3-70b"):
+        """
+        Answer prompt with the fastest healthy backend for the model family
+
+        Args:
+            prompt (str): The input text/prompt
+            family (str): Key of MODEL_FAMILIES
+
+        Returns:
+            str: Response text, or the last error string if every backend failed
+        """
+        backends = self.candidates(family)
+        if not backends:
+            return f"Error: no backend serves model family '{family}'"
+
+        result = None
+        for backend in backends:
+            started = time.perf_counter()
+            try:
+                with http_client.timeout_cap(self.timeout_for(backend)):
+                    result = backend.query_fn(prompt, model=backend.model_for(family))
+            except Exception as e:
+                result = f"Exception: {str(e)}"
+            latency = time.perf_counter() - started
+
+            if http_client.is_error_result(result):
+                backend.stats.record(latency, ok=False)
+                if backend.stats.consecutive_failures >= self.failures_before_cooldown:
+                    backend.stats.cooldown_until = time.monotonic() + self.cooldown
+                continue
+
+            text, tokens = backend.extract(result)
+            backend.stats.record(latency, ok=True, tokens=tokens)
+            return text
+
+        return result if result is not None else f"Error: all backends failed for '{family}'"
+
+    def stats(self):
+        """
+        Returns:
+            dict: Per-backend latency, error rate and tokens/sec
+        """
+        return {backend.name: backend.stats.snapshot() for backend in self.backends}
@@ -0,0 +1,284 @@
+"""
+Per-provider Rate Limiting and Retry Scheduling
+Token buckets for requests/min and tokens/min per provider, shared by every
+thread and task in the process, plus retries on 429/5xx that honour
+Retry-After and otherwise back off exponentially with full jitter.
+
+Each caller reserves capacity up front and sleeps for its own slot, so
+concurrent workers are paced in arrival order instead of all firing and
+tripping the provider limit. A 429 pauses the whole provider, not just the
+worker that hit it.
+
+Environment (PROVIDER = GROQ, OPENROUTER, TOGETHER, HF, OLLAMA):
+    <PROVIDER>_RPM     requests per minute (unset = unlimited)
+    <PROVIDER>_TPM     tokens per minute (unset = unlimited)
+    LLM_MAX_RETRIES    retries on 429/5xx (default 3)
+    LLM_BACKOFF_BASE   first backoff in seconds (default 0.5)
+    LLM_BACKOFF_MAX    longest backoff in seconds (default 30)
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import os
+import random
+import threading
+import time
+
+import request_trace
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_limiters = {}
+_deadline = contextvars.ContextVar("rate_limit_deadline", default=None)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate_per_minute, holding up to burst tokens
+
+    reserve() never refuses: it takes the tokens (going into debt if
+    needed) and returns how long the caller must wait for them, which
+    queues concurrent callers one behind the other.
+    """
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount):
+        """Give back over-reserved tokens (negative amount charges extra)"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderLimiter:
+    """
+    Request and token buckets for one provider plus a shared pause
+
+    Args:
+        rpm (float): Requests per minute, or None for unlimited
+        tpm (float): Tokens per minute, or None for unlimited
+    """
+
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens):
+        """
+        Claim capacity for one request
+
+        Returns:
+            float: Seconds to wait before sending
+        """
+        delay = 0.0
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        with self._lock:
+            return max(delay, self.paused_until - time.monotonic())
+
+    def pause(self, seconds):
+        """Hold every caller of this provider for `seconds` (after a 429)"""
+        with self._lock:
+            self.throttled += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the real usage is known"""
+        if self.tokens and actual is not None:
+            self.tokens.refund(estimated - actual)
+
+
+def get_limiter(provider):
+    """
+    Return the process-wide limiter for provider (configured from env)
+    """
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.get(provider)
+            if limiter is None:
+                prefix = provider.upper().replace(".", "_").replace("-", "_")
+                rpm = os.getenv(f"{prefix}_RPM")
+                tpm = os.getenv(f"{prefix}_TPM")
+                limiter = ProviderLimiter(float(rpm) if rpm else None, float(tpm) if tpm else None)
+                _limiters[provider] = limiter
+    return limiter
+
+
+def configure(provider, rpm=None, tpm=None):
+    """Set a provider's limits at runtime (None = unlimited)"""
+    with _lock:
+        _limiters[provider] = ProviderLimiter(rpm, tpm)
+
+
+def estimate_tokens(payload):
+    """
+    Rough token cost of a request: prompt characters / 4 plus max output
+    """
+    options = payload.get("options") or {}
+    parameters = payload.get("parameters") or {}
+    text = payload.get("messages", payload.get("prompt", payload.get("inputs", "")))
+    if isinstance(text, list):
+        text = " ".join(str(m.get("content", "")) if isinstance(m, dict) else str(m) for m in text)
+    max_tokens = payload.get("max_tokens", options.get("num_predict", parameters.get("max_length"))) or 0
+    return len(str(text)) // 4 + max(int(max_tokens), 0)
+
+
+def _actual_tokens(response):
+    try:
+        body = response.json()
+    except Exception:
+        return None
+    if isinstance(body, dict):
+        usage = body.get("usage")
+        if isinstance(usage, dict):
+            return usage.get("total_tokens")
+        if "eval_count" in body:
+            return body.get("prompt_eval_count", 0) + body["eval_count"]
+    return None
+
+
+def retry_after(response):
+    """
+    Seconds from a Retry-After header (delta-seconds or HTTP date), or None
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """
+    Don't start a retry that would wait past `seconds` from now (requests
+    made inside the block return their last response instead)
+    """
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline(), or None without one"""
+    end = _deadline.get()
+    return None if end is None else max(0.0, end - time.monotonic())
+
+
+def backoff(attempt):
+    """Full-jitter exponential backoff for the given retry attempt"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _next_wait(limiter, response, attempt, estimated):
+    # Seconds to wait before retrying, or None when the response is final
+    if response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+        return None
+    wait = retry_after(response)
+    if wait is None:
+        wait = backoff(attempt)
+    left = remaining()
+    if left is not None and wait >= left:
+        return None  # the retry couldn't finish within the caller's deadline
+    with limiter._lock:
+        limiter.retries += 1
+    # The retry reserves its tokens again; give back this attempt's
+    if limiter.tokens:
+        limiter.tokens.refund(estimated)
+    if response.status_code == 429:
+        # Everyone waits out the pause, this caller included (via reserve)
+        limiter.pause(wait)
+        return 0.0
+    return wait
+
+
+def send(send_fn, provider, payload, stream=False):
+    """
+    Pace and retry a blocking request
+
+    Args:
+        send_fn (callable): Sends the request and returns the response
+        provider (str): Provider name (see http_client.provider_for)
+        payload (dict): JSON body, used to estimate the token cost
+        stream (bool): Streaming response; real usage can't be read up front
+
+    Returns:
+        The final response (success or the last error after retries)
+    """
+    limiter = get_limiter(provider)
+    estimated = estimate_tokens(payload) if limiter.tokens else 0
+    attempt = 0
+    while True:
+        delay = limiter.reserve(estimated)
+        if delay > 0:
+            request_trace.record("throttle", delay)
+            time.sleep(delay)
+        response = send_fn()
+        wait = _next_wait(limiter, response, attempt, estimated)
+        if wait is None:
+            if limiter.tokens and response.status_code == 200 and not stream:
+                limiter.settle(estimated, _actual_tokens(response))
+            return response
+        response.close()
+        if wait:
+            request_trace.record("backoff", wait)
+            time.sleep(wait)
+        attempt += 1
+
+
+async def send_async(send_fn, provider, payload):
+    """
+    Pace and retry an async request (send_fn returns an awaitable)
+    """
+    limiter = get_limiter(provider)
+    estimated = estimate_tokens(payload) if limiter.tokens else 0
+    attempt = 0
+    while True:
+        delay = limiter.reserve(estimated)
+        if delay > 0:
+            request_trace.record("throttle", delay)
+            await asyncio.sleep(delay)
+        response = await send_fn()
+        wait = _next_wait(limiter, response, attempt, estimated)
+        if wait is None:
+            if limiter.tokens and response.status_code == 200:
+                limiter.settle(estimated, _actual_tokens(response))
+            return response
+        await response.aclose()
+        if wait:
+            request_trace.record("backoff", wait)
+            await asyncio.sleep(wait)
+        attempt += 1
@@ -0,0 +1,343 @@
+"""
+Per-request Timing Breakdown
+Opt-in tracing for every provider query function. Each call produces one
+trace with the time spent in DNS, TCP connect, TLS handshake, waiting for
+the first byte (TTFB), body download, JSON decode and rate-limit waits,
+plus the provider's own timings (Ollama's *_duration fields, Groq/OpenAI
+`usage`). Traces go to a pluggable sink: any callable taking a dict.
+
+    import request_trace
+    request_trace.enable()                       # one line per call on stderr
+    request_trace.enable(request_trace.JsonlSink("traces.jsonl"))
+    traces = []; request_trace.enable(traces.append)
+
+Environment:
+    LLM_TRACE=1            print traces to stderr
+    LLM_TRACE=<file>       append traces to a JSONL file
+
+DNS is timed separately on the requests (blocking) path only; on httpx
+paths (async and HTTP/2) it is included in "connect". Streaming calls are
+traced up to the response headers.
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Ollama reports these in nanoseconds
+OLLAMA_DURATIONS = ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+
+_sink = None
+_current = contextvars.ContextVar("request_trace", default=None)
+
+
+class Trace:
+    """
+    Timings for one query function call (seconds internally, ms in as_dict)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.url = None
+        self.provider = None
+        self.status = None
+        self.cached = False
+        self.requests = 0
+        self.phases = {}
+        self.provider_timings = {}
+        self.usage = None
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._marks = {}
+        self._setup = 0.0
+
+    def take_setup(self):
+        """Seconds of connection setup (DNS/connect/TLS) since the last call"""
+        setup, self._setup = self._setup, 0.0
+        return setup
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def httpx_hook(self, event, info):
+        """httpx/httpcore "trace" extension callback (sync clients)"""
+        parts = event.split(".")
+        if len(parts) < 3:
+            return
+        step, state = parts[-2], parts[-1]
+        phase = {"connect_tcp": "connect", "start_tls": "tls",
+                 "receive_response_headers": "ttfb", "receive_response_body": "body"}.get(step)
+        if phase is None:
+            return
+        if state == "started":
+            self._marks[phase] = time.perf_counter()
+        elif phase in self._marks:
+            self.add(phase, time.perf_counter() - self._marks.pop(phase))
+
+    async def httpx_ahook(self, event, info):
+        """httpx "trace" extension callback (async clients)"""
+        self.httpx_hook(event, info)
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "url": self.url,
+            "provider": self.provider,
+            "status": self.status,
+            "cached": self.cached,
+            "requests": self.requests,
+            "started": round(self.started, 3),
+            "total_ms": round((time.perf_counter() - self._t0) * 1000, 2),
+            "phases_ms": {phase: round(seconds * 1000, 2) for phase, seconds in self.phases.items()},
+            "provider_ms": self.provider_timings,
+            "usage": self.usage,
+        }
+
+
+def print_sink(trace):
+    """Default sink: one summary line per trace on stderr"""
+    phases = " ".join(f"{phase}={ms:.0f}" for phase, ms in trace["phases_ms"].items())
+    provider = " ".join(f"{key}={value:.0f}" for key, value in trace["provider_ms"].items())
+    usage = trace["usage"] or {}
+    if "total_tokens" in usage:
+        provider += f" tokens={usage.get('prompt_tokens', 0)}+{usage.get('completion_tokens', 0)}"
+    provider = provider.strip()
+    sys.stderr.write(
+        f"[trace] {trace['name']} {trace['provider'] or '-'} status={trace['status']} "
+        f"total={trace['total_ms']:.0f}ms {phases}{' | ' + provider if provider else ''}"
+        f"{' (cached)' if trace['cached'] else ''}\n"
+    )
+
+
+class JsonlSink:
+    """Append each trace as one JSON line (thread safe)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, trace):
+        line = json.dumps(trace) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def enable(sink=print_sink):
+    """Start tracing; sink is called with one dict per query function call"""
+    global _sink
+    _sink = sink
+
+
+def disable():
+    global _sink
+    _sink = None
+
+
+def enabled():
+    return _sink is not None
+
+
+def _emit(trace):
+    try:
+        _sink(trace.as_dict())
+    except Exception as e:
+        print(f"Warning: trace sink failed: {e}")
+
+
+def traced(fn):
+    """
+    Decorator giving a query function (sync or async) its own trace
+
+    Costs one global lookup per call while tracing is disabled.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if _sink is None:
+                return await fn(*args, **kwargs)
+            trace = Trace(fn.__name__)
+            token = _current.set(trace)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _current.reset(token)
+                _emit(trace)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _sink is None:
+            return fn(*args, **kwargs)
+        trace = Trace(fn.__name__)
+        token = _current.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+            _emit(trace)
+    return wrapper
+
+
+def current():
+    """The trace of the query function running in this thread/task, if any"""
+    return _current.get()
+
+
+def record(phase, seconds):
+    """Add time to a phase of the current trace (no-op when not tracing)"""
+    trace = _current.get()
+    if trace is not None and seconds > 0:
+        trace.add(phase, seconds)
+
+
+def begin(method, url, provider):
+    """
+    Trace for a request about to be sent
+
+    Requests made outside a traced query function get a trace of their own,
+    emitted by end() (without JSON decode time, which happens afterwards).
+
+    Returns:
+        (trace, token): pass both to end(); (None, None) when tracing is disabled
+    """
+    if _sink is None:
+        return None, None
+    trace = _current.get()
+    token = None
+    if trace is None:
+        trace = Trace(f"{method} {provider}")
+        token = _current.set(trace)
+    trace.url = url
+    trace.provider = provider
+    trace.requests += 1
+    return trace, token
+
+
+def end(trace, token):
+    if token is not None:
+        _current.reset(token)
+        _emit(trace)
+
+
+def _provider_timings(trace, body):
+    if not isinstance(body, dict):
+        return
+    for key in OLLAMA_DURATIONS:
+        if key in body:
+            trace.provider_timings[key] = round(body[key] / 1e6, 2)
+    if isinstance(body.get("usage"), dict):
+        trace.usage = body["usage"]
+
+
+def attach(trace, response, sent_at=None, stream=False):
+    """
+    Record status and timings of a response and time its .json() decode
+
+    Args:
+        sent_at (float): perf_counter() before a blocking requests call;
+                         TTFB and body download are derived from it
+        stream (bool): The body has not been read yet
+    """
+    trace.status = getattr(response, "status_code", None)
+    trace.cached = getattr(response, "from_cache", False)
+    setup = trace.take_setup()
+    if sent_at is not None and hasattr(response, "elapsed") and not trace.cached:
+        # requests: elapsed runs from sending to parsed headers (including
+        # connection setup), and a non-streamed body is read before send() returns
+        waited = response.elapsed.total_seconds()
+        trace.add("ttfb", max(0.0, waited - setup))
+        if not stream:
+            trace.add("body", max(0.0, time.perf_counter() - sent_at - waited))
+
+    original = response.json
+
+    def timed_json(*args, **kwargs):
+        started = time.perf_counter()
+        body = original(*args, **kwargs)
+        trace.add("decode", time.perf_counter() - started)
+        _provider_timings(trace, body)
+        return body
+
+    response.json = timed_json
+
+
+class _TracedConnectionMixin:
+    # Splits urllib3's connect into DNS, TCP connect and TLS for the current trace
+
+    def _new_conn(self):
+        trace = _current.get() if _sink is not None else None
+        if trace is None:
+            return super()._new_conn()
+        started = time.perf_counter()
+        host = self._dns_host
+        try:
+            address = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+        except OSError:
+            address = None  # let urllib3 raise its usual resolution error
+        resolved = time.perf_counter()
+        trace.add("dns", resolved - started)
+        if address is not None:
+            self._dns_host = address
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+            trace.add("connect", time.perf_counter() - resolved)
+            self._socket_setup = time.perf_counter() - started
+
+    def connect(self):
+        trace = _current.get() if _sink is not None else None
+        if trace is None:
+            return super().connect()
+        started = time.perf_counter()
+        self._socket_setup = 0.0
+        try:
+            super().connect()
+        finally:
+            total = time.perf_counter() - started
+            if isinstance(self, HTTPSConnection):
+                trace.add("tls", max(0.0, total - self._socket_setup))
+            trace._setup += total
+
+
+class _TracedHTTPConnection(_TracedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TracedHTTPSConnection(_TracedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TracedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TracedHTTPConnection
+
+
+class _TracedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TracedHTTPSConnection
+
+
+class TracingHTTPAdapter(HTTPAdapter):
+    """requests adapter whose connections report DNS/connect/TLS timings"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TracedHTTPConnectionPool,
+            "https": _TracedHTTPSConnectionPool,
+        }
+
+
+_env = os.getenv("LLM_TRACE", "")
+if _env and _env != "0":
+    enable(print_sink if _env == "1" else JsonlSink(_env))
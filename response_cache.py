@@ -0,0 +1,272 @@
+"""
+Persistent Response Cache for provider calls
+SQLite-backed, keyed by a hash of provider + model + messages + sampling
+params, with TTL expiry and LRU eviction by entry count and total size.
+
+Environment:
+    LLM_CACHE=0                  disable the cache
+    LLM_CACHE_PATH               database file (default .llm_cache.sqlite3)
+    LLM_CACHE_TTL                seconds an entry stays valid (default 86400)
+    LLM_CACHE_MAX_ENTRIES        entries kept before LRU eviction (default 10000)
+    LLM_CACHE_MAX_BYTES          total response bytes kept (default 100 MB)
+    LLM_CACHE_ALLOW_SAMPLED=1    also cache requests with temperature > 0
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+ALLOW_SAMPLED = os.getenv("LLM_CACHE_ALLOW_SAMPLED", "0") == "1"
+
+_lock = threading.Lock()
+_cache = None
+
+
+def _sampling_params(payload):
+    # OpenAI-style top level, Ollama "options", Hugging Face "parameters"
+    options = payload.get("options") or {}
+    parameters = payload.get("parameters") or {}
+    temperature = payload.get("temperature", options.get("temperature", parameters.get("temperature")))
+    max_tokens = payload.get("max_tokens", options.get("num_predict", parameters.get("max_length")))
+    return temperature, max_tokens
+
+
+def cache_key(url, payload):
+    """
+    Hash provider + model + messages + temperature + max_tokens
+
+    Any other payload fields (system prompt, Ollama context/options, ...)
+    are folded in as well so different requests never share an entry.
+    """
+    parts = urlsplit(url)
+    temperature, max_tokens = _sampling_params(payload)
+    key = {
+        "provider": f"{parts.hostname}{parts.path}",
+        "model": payload.get("model"),
+        "messages": payload.get("messages", payload.get("prompt", payload.get("inputs"))),
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "extra": {k: v for k, v in payload.items()
+                  if k not in ("model", "messages", "prompt", "inputs", "temperature", "max_tokens")},
+    }
+    blob = json.dumps(key, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(payload):
+    """
+    Deterministic requests only, unless sampled caching is allowed
+
+    A missing temperature means the provider default, which is > 0.
+    """
+    if ALLOW_SAMPLED:
+        return True
+    temperature, _ = _sampling_params(payload)
+    return temperature is not None and temperature <= 0
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for a requests/httpx response served from the cache
+    """
+
+    from_cache = True
+
+    def __init__(self, content):
+        self.status_code = 200
+        self.content = content
+        self.headers = {"Content-Type": "application/json"}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ResponseCache:
+    """
+    SQLite store with TTL and LRU eviction (by entries and total bytes)
+
+    The database file is only opened (and created) when something is
+    actually cached, so processes that only send sampled requests never
+    write one.
+
+    Attributes:
+        hits, misses, bypassed, evictions (int): Counters since startup
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=TTL, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._db = None
+        self._count = self._bytes = 0
+
+    def _connect(self):
+        # Called with self._lock held
+        if self._db is not None:
+            return
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._count, self._bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    def get(self, key):
+        """
+        Return the cached bytes for key, or None on miss / expiry
+        """
+        now = time.time()
+        with self._lock:
+            self._connect()
+            row = self._db.execute(
+                "SELECT value, size, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, size, created = row
+            if self.ttl and now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count -= 1
+                self._bytes -= size
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value (bytes) and evict least recently used entries over the limits"""
+        now = time.time()
+        with self._lock:
+            self._connect()
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._count -= 1
+                self._bytes -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._count += 1
+            self._bytes += len(value)
+            self._evict()
+
+    def _evict(self):
+        while self._count > self.max_entries or self._bytes > self.max_bytes:
+            excess = max(self._count - self.max_entries, 1)
+            rows = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT ?", (excess,)
+            ).fetchall()
+            if not rows:
+                break
+            self._db.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k, _ in rows])
+            self._count -= len(rows)
+            self._bytes -= sum(size for _, size in rows)
+            self.evictions += len(rows)
+
+    def lookup(self, url, payload):
+        """
+        Return (key, CachedResponse or None); key is None when bypassed
+        """
+        if not is_cacheable(payload):
+            with self._lock:
+                self.bypassed += 1
+            return None, None
+        key = cache_key(url, payload)
+        value = self.get(key)
+        return key, CachedResponse(value) if value is not None else None
+
+    def store(self, key, response):
+        """Cache a successful provider response under key"""
+        if key is not None and response.status_code == 200:
+            self.put(key, response.content)
+
+    def clear(self):
+        with self._lock:
+            self._connect()
+            self._db.execute("DELETE FROM responses")
+            self._count = 0
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, bypassed, evictions, entries, bytes
+        """
+        with self._lock:
+            if self._db is None and os.path.exists(self.path):
+                self._connect()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "entries": self._count,
+                "bytes": self._bytes,
+            }
+
+
+def get_cache():
+    """
+    Return the shared cache, or None when LLM_CACHE=0
+    """
+    global _cache
+    if not ENABLED:
+        return None
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def configure(enabled=None, allow_sampled=None, **settings):
+    """
+    Change cache settings at runtime
+
+    Args:
+        enabled (bool): Turn the cache on or off
+        allow_sampled (bool): Cache requests with temperature > 0
+        **settings: path, ttl, max_entries, max_bytes for a new cache
+    """
+    global ENABLED, ALLOW_SAMPLED, _cache
+    if enabled is not None:
+        ENABLED = enabled
+    if allow_sampled is not None:
+        ALLOW_SAMPLED = allow_sampled
+    if settings:
+        with _lock:
+            _cache = ResponseCache(**settings)
@@ -0,0 +1,158 @@
+"""
+Semantic Cache for paraphrased prompts
+Embeds prompts with the local Ollama embeddings endpoint and serves a
+stored answer when an earlier prompt was similar enough, so "What is
+Docker?" and "Explain Docker in one sentence" can share one call.
+
+Environment:
+    LLM_SEMANTIC_CACHE_PATH   index directory (default .llm_semantic_cache)
+    LLM_SEMANTIC_THRESHOLD    minimum cosine similarity (default 0.92)
+    LLM_EMBED_MODEL           Ollama embedding model (default nomic-embed-text)
+"""
+
+import atexit
+import json
+import os
+import threading
+
+import http_client
+from ollama_api import embed_ollama
+from vector_index import VectorIndex
+
+CACHE_PATH = os.getenv("LLM_SEMANTIC_CACHE_PATH", ".llm_semantic_cache")
+THRESHOLD = float(os.getenv("LLM_SEMANTIC_THRESHOLD", "0.92"))
+EMBED_MODEL = os.getenv("LLM_EMBED_MODEL", "nomic-embed-text")
+
+_lock = threading.Lock()
+_cache = None
+
+
+class SemanticCache:
+    """
+    Answers indexed by prompt embedding
+
+    Args:
+        path (str): Directory for persistence (None keeps it in memory)
+        threshold (float): Minimum cosine similarity for a hit
+        embed_model (str): Ollama embedding model
+        ivf_threshold (int): Switch to IVF search above this many entries
+    """
+
+    def __init__(self, path=CACHE_PATH, threshold=THRESHOLD, embed_model=EMBED_MODEL, ivf_threshold=50000):
+        self.path = path
+        self.threshold = threshold
+        self.embed_model = embed_model
+        self.ivf_threshold = ivf_threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(os.path.join(path, "entries.json")):
+            self.index = VectorIndex.load(path, mmap=True)
+            with open(os.path.join(path, "entries.json")) as f:
+                self.entries = json.load(f)
+            # A save interrupted between the two files leaves one of them
+            # longer than the other: drop the rows that aren't in both
+            del self.entries[len(self.index):]
+            self.index.truncate(len(self.entries))
+        else:
+            self.index = VectorIndex()
+            self.entries = []
+
+    def embed(self, prompt):
+        """Return the prompt embedding, or None if Ollama is unavailable"""
+        vectors = embed_ollama([prompt], model=self.embed_model)
+        return vectors[0] if vectors else None
+
+    def get(self, prompt, model=None, vector=None):
+        """
+        Look up a semantically similar prompt for the same model
+
+        Returns:
+            tuple: (answer or None, prompt embedding or None)
+        """
+        if vector is None:
+            vector = self.embed(prompt)
+        if vector is None:
+            return None, None
+
+        with self._lock:
+            rows, scores = self.index.search(vector, k=8)
+            for row, score in zip(rows, scores):
+                if score < self.threshold:
+                    break
+                entry = self.entries[row]
+                if entry["model"] == model:
+                    self.hits += 1
+                    return entry["answer"], vector
+            self.misses += 1
+        return None, vector
+
+    def put(self, prompt, answer, model=None, vector=None):
+        """Store an answer under the prompt's embedding"""
+        if vector is None:
+            vector = self.embed(prompt)
+        if vector is None:
+            return
+        with self._lock:
+            self.index.add(vector)
+            self.entries.append({"prompt": prompt, "model": model, "answer": answer})
+            if self.index.centroids is None and len(self.entries) > self.ivf_threshold:
+                self.index.train_ivf()
+
+    def save(self):
+        """Persist vectors (mmap-able .npy) and answers to self.path"""
+        if not self.path:
+            return
+        with self._lock:
+            # Answers first, swapped in whole; the vectors follow
+            os.makedirs(self.path, exist_ok=True)
+            entries_path = os.path.join(self.path, "entries.json")
+            with open(f"{entries_path}.tmp", "w") as f:
+                json.dump(self.entries, f)
+            os.replace(f"{entries_path}.tmp", entries_path)
+            self.index.save(self.path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+def get_semantic_cache():
+    """
+    Return the shared semantic cache (saved automatically at exit)
+    """
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = SemanticCache()
+                atexit.register(_cache.save)
+    return _cache
+
+
+def semantic_query(prompt, query_fn, model=None, cache=None, **kwargs):
+    """
+    Call query_fn(prompt) unless a similar prompt was already answered
+
+    Args:
+        prompt (str): The input text/prompt
+        query_fn (callable): Any provider function, e.g. call_groq_api
+        model (str): Passed to query_fn as model=..., and part of the match
+        cache (SemanticCache): Defaults to the shared cache
+
+    Returns:
+        Whatever query_fn returns (failures are never cached)
+    """
+    cache = cache or get_semantic_cache()
+    # Without an explicit model, answers are only shared within one provider function
+    namespace = model if model is not None else getattr(query_fn, "__name__", None)
+    answer, vector = cache.get(prompt, namespace)
+    if answer is not None:
+        return answer
+
+    if model is not None:
+        kwargs["model"] = model
+    result = query_fn(prompt, **kwargs)
+    if not http_client.is_error_result(result):
+        cache.put(prompt, result, namespace, vector)
+    return result
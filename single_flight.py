@@ -0,0 +1,339 @@
+"""
+Single-flight Request Coalescing
+When several callers send the same request (same provider, model and
+payload) at the same moment, only the first one goes upstream; the others
+wait for it and get its response. Streaming requests are fanned out: every
+subscriber reads the same token stream, and one that joins mid-stream gets
+the part already received first.
+
+Off by default: callers asking at the same instant share one answer, so a
+sampled (temperature > 0) request gives them the same sample. Hooked into
+http_client.request and async_client.post.
+
+Environment:
+    LLM_SINGLE_FLIGHT=1   coalesce identical in-flight requests
+"""
+
+import asyncio
+import json
+import os
+import threading
+
+ENABLED = os.getenv("LLM_SINGLE_FLIGHT", "0") == "1"
+
+_lock = threading.Lock()
+_flights = {}            # key -> _Flight (thread path)
+_async_flights = {}      # (loop id, key) -> _AsyncFlight (asyncio path, one loop at a time)
+_counts = {"leaders": 0, "coalesced": 0}
+
+
+def enabled():
+    return ENABLED
+
+
+def configure(enabled=None):
+    """Turn coalescing on or off at runtime"""
+    global ENABLED
+    if enabled is not None:
+        ENABLED = enabled
+
+
+def request_key(method, url, kwargs):
+    """
+    Identity of a request: method, URL, credentials and the JSON payload
+    (timeouts don't make requests different)
+    """
+    headers = kwargs.get("headers") or {}
+    return (method, url, headers.get("Authorization"), bool(kwargs.get("stream")),
+            json.dumps(kwargs.get("json"), sort_keys=True, default=str))
+
+
+class SharedResponse:
+    """
+    A coalesced caller's view of the leader's response
+
+    Reads the same body, but .json() decodes it afresh so per-response
+    hooks (metrics token counts, trace decode timing) stay with the leader.
+    """
+
+    coalesced = True
+
+    def __init__(self, response):
+        self._response = response
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def json(self, **kwargs):
+        return json.loads(self._response.content, **kwargs)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+def do(method, url, kwargs, fn):
+    """
+    Run fn() for this request unless an identical one is already in flight
+
+    Args:
+        fn (callable): Sends the request and returns the response
+
+    Returns:
+        tuple: (response, shared); shared is True when another caller's
+               request was reused
+    """
+    key = request_key(method, url, kwargs)
+    stream = bool(kwargs.get("stream"))
+    while True:
+        with _lock:
+            flight = _flights.get(key)
+            if flight is None:
+                flight = _flights[key] = _Flight()
+                _counts["leaders"] += 1
+                break
+            if flight.done.is_set() and stream:
+                # A stream that is still being fanned out
+                subscriber = flight.response.subscribe()
+                if subscriber is not None:
+                    _counts["coalesced"] += 1
+                    return subscriber, True
+                continue
+            _counts["coalesced"] += 1
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        if not stream:
+            return SharedResponse(flight.response), True
+        subscriber = flight.response.subscribe()
+        if subscriber is not None:
+            return subscriber, True
+        # Everyone left before we got there: start over
+
+    try:
+        response = fn()
+        if stream:
+            flight.response = _Fanout(response, key)
+            return flight.response.leader, False
+        response.content  # read the body once, for every caller
+        flight.response = response
+        return response, False
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        if not stream or flight.error is not None:
+            with _lock:
+                if _flights.get(key) is flight:
+                    del _flights[key]
+        flight.done.set()
+
+
+class _Fanout:
+    """
+    Reads a streaming response once and hands every chunk to all subscribers
+    """
+
+    def __init__(self, response, key):
+        self.response = response
+        self.key = key
+        self.chunks = []
+        self.finished = False
+        self.abandoned = False
+        self.error = None
+        self.subscribers = 1
+        self._cond = threading.Condition()
+        self.leader = StreamSubscriber(self)
+        threading.Thread(target=self._pump, name="single-flight-stream", daemon=True).start()
+
+    def subscribe(self):
+        """New reader from the first chunk, or None if the stream was abandoned"""
+        with self._cond:
+            if self.abandoned:
+                return None
+            self.subscribers += 1
+            return StreamSubscriber(self)
+
+    def _upstream(self):
+        if hasattr(self.response, "iter_bytes"):
+            return self.response.iter_bytes()
+        return self.response.iter_content(chunk_size=None)
+
+    def _pump(self):
+        try:
+            for chunk in self._upstream():
+                with self._cond:
+                    self.chunks.append(chunk)
+                    self._cond.notify_all()
+                if self._abandoned():
+                    return
+        except Exception as e:
+            with self._cond:
+                self.error = e
+        finally:
+            self.response.close()
+            self._finish()
+
+    def _abandoned(self):
+        # Every reader closed early (e.g. a stop sequence): stop generating,
+        # unless someone subscribes before the flight is removed
+        with self._cond:
+            if self.subscribers > 0:
+                return False
+        with _lock:
+            with self._cond:
+                if self.subscribers > 0:
+                    return False
+                self.abandoned = True
+                self._remove()
+                return True
+
+    def _remove(self):
+        flight = _flights.get(self.key)
+        if flight is not None and flight.response is self:
+            del _flights[self.key]
+
+    def _finish(self):
+        with _lock:
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+            self._remove()
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def chunk(self, index):
+        """Chunk number index, waiting for it; None at the end of the stream"""
+        with self._cond:
+            while index >= len(self.chunks) and not self.finished:
+                self._cond.wait()
+            if index < len(self.chunks):
+                return self.chunks[index]
+            if self.error is not None:
+                raise self.error
+            return None
+
+
+class StreamSubscriber:
+    """
+    One reader of a fanned-out stream (iter_content / iter_lines like requests)
+    """
+
+    def __init__(self, fanout):
+        self._fanout = fanout
+        upstream = fanout.response
+        self.status_code = upstream.status_code
+        self.headers = upstream.headers
+        self.url = getattr(upstream, "url", None)
+        self.encoding = getattr(upstream, "encoding", None) or "utf-8"
+        self.reason = getattr(upstream, "reason", getattr(upstream, "reason_phrase", ""))
+        self._closed = False
+
+    def raise_for_status(self):
+        return self._fanout.response.raise_for_status()
+
+    def iter_content(self, chunk_size=None, decode_unicode=False):
+        index = 0
+        while not self._closed:
+            chunk = self._fanout.chunk(index)
+            if chunk is None:
+                return
+            index += 1
+            yield chunk.decode(self.encoding, errors="replace") if decode_unicode else chunk
+
+    iter_bytes = iter_content
+
+    def iter_lines(self, chunk_size=None, decode_unicode=False, delimiter=None):
+        pending = b""
+        for chunk in self.iter_content():
+            pending += chunk
+            lines = pending.split(delimiter.encode() if delimiter else b"\n")
+            pending = lines.pop()
+            for line in lines:
+                line = line if delimiter else line.rstrip(b"\r")
+                yield line.decode(self.encoding, errors="replace") if decode_unicode else line
+        if pending:
+            yield pending.decode(self.encoding, errors="replace") if decode_unicode else pending
+
+    @property
+    def content(self):
+        return b"".join(self.iter_content())
+
+    def read(self):
+        return self.content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._fanout.unsubscribe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _AsyncFlight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+async def do_async(method, url, kwargs, fn):
+    """
+    Await fn() for this request unless an identical one is already in flight
+
+    The upstream call runs as its own task: a caller that is cancelled
+    (e.g. a losing hedge) only stops waiting, and the call is cancelled
+    once nobody is waiting for it.
+
+    Returns:
+        tuple: (response, shared)
+    """
+    key = (id(asyncio.get_running_loop()), request_key(method, url, kwargs))
+    flight = _async_flights.get(key)
+    shared = flight is not None
+    if shared:
+        _counts["coalesced"] += 1
+    else:
+        _counts["leaders"] += 1
+        flight = _async_flights[key] = _AsyncFlight(asyncio.ensure_future(fn()))
+
+        def landed(_):
+            if _async_flights.get(key) is flight:
+                del _async_flights[key]
+
+        flight.task.add_done_callback(landed)
+
+    flight.waiters += 1
+    try:
+        response = await asyncio.shield(flight.task)
+    except asyncio.CancelledError:
+        if not flight.task.done():
+            flight.waiters -= 1
+            if flight.waiters == 0:
+                flight.task.cancel()
+        raise
+    return (SharedResponse(response) if shared else response), shared
+
+
+def stats():
+    """
+    Returns:
+        dict: leaders (requests sent), coalesced (requests that reused one), in_flight
+    """
+    with _lock:
+        return dict(_counts, in_flight=len(_flights) + len(_async_flights))
@@ -0,0 +1,163 @@
+"""
+Server-Sent Events streaming for OpenAI-compatible chat APIs
+(Groq, OpenRouter, Together AI)
+"""
+
+import json
+import time
+
+import http_client
+
+
+def iter_sse_data(chunks):
+    """
+    Yield the payload of each `data:` line from a stream of byte chunks
+
+    Bytes are accumulated in one reusable buffer and only `data:` lines are
+    copied out, so comments/keep-alives and event names cost no allocations.
+
+    Args:
+        chunks (iterable): Raw byte chunks as they arrive from the socket
+
+    Yields:
+        bytes: Frame payload with the `data:` prefix stripped
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            if buffer.startswith(b"data:", start):
+                line_end = end - 1 if end > start and buffer[end - 1] == 13 else end
+                offset = start + 5
+                if offset < line_end and buffer[offset] == 32:
+                    offset += 1
+                yield bytes(buffer[offset:line_end])
+            start = end + 1
+        if start:
+            del buffer[:start]
+
+
+def _iter_chunks(response):
+    # httpx responses (HTTP/2 path) and requests responses read differently
+    if hasattr(response, "iter_bytes"):
+        return response.iter_bytes()
+    return response.iter_content(chunk_size=None)
+
+
+def _error_text(response):
+    if hasattr(response, "iter_bytes"):
+        response.read()
+    return response.text[:200]
+
+
+class ChatStream:
+    """
+    Delta iterator over a streaming chat completion
+
+    Iterate to receive content deltas. Breaking out of the loop, hitting a
+    stop sequence, calling close() or leaving a `with` block closes the
+    connection so the provider stops generating (and billing) tokens.
+
+    Attributes:
+        time_to_first_token (float): Seconds from request to first delta
+        finish_reason (str): "stop", "length", ... once finished
+        usage (dict): Token usage, if the provider sent it
+    """
+
+    def __init__(self, response, started, stop=None):
+        self._response = response
+        self._started = started
+        self._stop = [s for s in (stop or []) if s]
+        self._hold = max((len(s) for s in self._stop), default=1) - 1
+        self.time_to_first_token = None
+        self.finish_reason = None
+        self.usage = None
+
+    def _deltas(self):
+        for data in iter_sse_data(_iter_chunks(self._response)):
+            if data == b"[DONE]":
+                return
+            frame = json.loads(data)
+            if frame.get("usage"):
+                self.usage = frame["usage"]
+            choices = frame.get("choices") or [{}]
+            if choices[0].get("finish_reason"):
+                self.finish_reason = choices[0]["finish_reason"]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - self._started
+                yield delta
+
+    def __iter__(self):
+        try:
+            if not self._stop:
+                yield from self._deltas()
+                return
+
+            # Hold back a tail long enough to catch a stop sequence split across deltas
+            pending = ""
+            for delta in self._deltas():
+                pending += delta
+                hits = [i for i in (pending.find(s) for s in self._stop) if i != -1]
+                if hits:
+                    if min(hits):
+                        yield pending[:min(hits)]
+                    self.finish_reason = "stop"
+                    return
+                if len(pending) > self._hold:
+                    cut = len(pending) - self._hold
+                    yield pending[:cut]
+                    pending = pending[cut:]
+            if pending:
+                yield pending
+        finally:
+            self.close()
+
+    def text(self):
+        """Consume the stream and return the full completion"""
+        return "".join(self)
+
+    def close(self):
+        """Stop generation and close the connection"""
+        self._response.close()
+
+    cancel = close
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_chat_stream(url, headers, payload, stop=None, timeout=60):
+    """
+    Start a streaming chat completion
+
+    Args:
+        url (str): Provider chat completions URL
+        headers (dict): Request headers including Authorization
+        payload (dict): Chat payload; "stream" is set automatically
+        stop (list): Client-side stop sequences
+        timeout (int): Seconds to wait for the connection / between chunks
+
+    Returns:
+        ChatStream: Delta iterator, or None on error
+    """
+    payload = dict(payload, stream=True)
+    started = time.perf_counter()
+    try:
+        response = http_client.post(url, headers=headers, json=payload, timeout=timeout, stream=True)
+        if response.status_code != 200:
+            print(f"Error {response.status_code}: {_error_text(response)}")
+            response.close()
+            return None
+        return ChatStream(response, started, stop)
+    except Exception as e:
+        print(f"Exception: {str(e)}")
+        return None
@@ -0,0 +1,229 @@
+"""
+Map-Reduce Summarization for long documents
+Summarization models only read a short window (bart-large-cnn ~1024
+tokens), so a long document is split into overlapping chunks on sentence
+boundaries, the chunks are summarized in parallel, and the partial
+summaries are summarized again in groups until one summary is left.
+
+Chunk boundaries are chosen from the sentences themselves, so an edit only
+changes the chunks around it. Every summary is cached (response cache,
+keyed by a hash of the text), so re-summarizing an edited document only
+re-runs the changed chunks and the reduce steps above them.
+
+Usage:
+    from huggingface_hub import InferenceClient
+    summarizer = Summarizer(hf_summarizer(InferenceClient(api_key=token)))
+    print(summarizer.summarize(long_text))
+
+    summarizer = Summarizer(chat_summarizer(call_groq_api), chunk_chars=8000)
+    for event in summarizer.stream(long_text):     # partial summaries as they finish
+        print(event["level"], event["index"], event["summary"][:80])
+"""
+
+import hashlib
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import http_client
+import response_cache
+from text_split import split_sentences
+
+SUMMARY_PROMPT = "Summarize the following text in a few sentences. Keep names, numbers and conclusions.\n\n{text}"
+
+
+def chunk_text(text, max_chars=3000, overlap=200):
+    """
+    Split text into chunks of at most max_chars on sentence boundaries
+
+    Once a chunk is half full it ends after any sentence whose hash picks it
+    as a boundary, so boundaries depend on content rather than position and
+    an edit early in a document doesn't shift every later chunk.
+
+    Returns:
+        list: Chunks, each starting with up to `overlap` characters of the
+              previous chunk's last sentences
+    """
+    chunks = []
+    current = []
+    size = 0
+    for sentence in split_sentences(text, max_chars - overlap):
+        if current and size + len(sentence) + 1 > max_chars - overlap:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(sentence)
+        size += len(sentence) + 1
+        if size >= max_chars // 2 and zlib.crc32(sentence.encode("utf-8")) % 4 == 0:
+            chunks.append(current)
+            current, size = [], 0
+    if current:
+        chunks.append(current)
+
+    result = []
+    for n, sentences in enumerate(chunks):
+        carried = []
+        kept = 0
+        for previous in reversed(chunks[n - 1] if n else []):
+            if kept + len(previous) > overlap:
+                break
+            carried.insert(0, previous)
+            kept += len(previous) + 1
+        result.append(" ".join(carried + sentences))
+    return result
+
+
+def hf_summarizer(client, model="facebook/bart-large-cnn"):
+    """
+    Summarize with a huggingface_hub InferenceClient
+
+    Returns:
+        callable: text -> summary, or None on error
+    """
+    def summarize(text):
+        try:
+            output = client.summarization(text, model=model)
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+        if isinstance(output, dict):
+            return output.get("summary_text")
+        return getattr(output, "summary_text", output)
+
+    summarize.cache_name = f"hf:{model}"
+    return summarize
+
+
+def chat_summarizer(query_fn, prompt=SUMMARY_PROMPT, **kwargs):
+    """
+    Summarize with any provider function (call_groq_api, query_ollama, ...)
+
+    Returns:
+        callable: text -> summary, or None on error
+    """
+    def summarize(text):
+        result = query_fn(prompt.format(text=text), **kwargs)
+        if isinstance(result, dict):
+            result = result.get("response")  # Ollama
+        return None if http_client.is_error_result(result) else result
+
+    name = getattr(query_fn, "__name__", "chat")
+    summarize.cache_name = f"{name}:{sorted(kwargs.items())}:{prompt}"
+    return summarize
+
+
+class Summarizer:
+    """
+    Map-reduce summarizer
+
+    Args:
+        summarize_fn (callable): text -> summary (hf_summarizer, chat_summarizer, ...)
+        chunk_chars (int): Largest chunk sent to the model (fit its input window)
+        overlap (int): Characters repeated between neighbouring chunks
+        concurrency (int): Chunks summarized at once
+        max_levels (int): Reduce levels before the remaining summaries are joined as is
+        cache (bool): Reuse summaries of unchanged text (needs the response cache)
+    """
+
+    def __init__(self, summarize_fn, chunk_chars=3000, overlap=200, concurrency=4, max_levels=4, cache=True):
+        self.summarize_fn = summarize_fn
+        self.name = getattr(summarize_fn, "cache_name", getattr(summarize_fn, "__name__", "summarizer"))
+        self.chunk_chars = chunk_chars
+        self.overlap = overlap
+        self.concurrency = concurrency
+        self.max_levels = max_levels
+        self.cache = cache
+        self.calls = 0
+        self.cached = 0
+        self._lock = threading.Lock()
+
+    def _key(self, text):
+        digest = hashlib.sha256(f"{self.name}\0{text}".encode("utf-8")).hexdigest()
+        return f"summary:{digest}"
+
+    def _summarize(self, text):
+        # (summary, from_cache)
+        cache = response_cache.get_cache() if self.cache else None
+        key = self._key(text)
+        if cache is not None:
+            value = cache.get(key)
+            if value is not None:
+                with self._lock:
+                    self.cached += 1
+                return value.decode("utf-8"), True
+        with self._lock:
+            self.calls += 1
+        summary = self.summarize_fn(text)
+        if summary and cache is not None:
+            cache.put(key, summary.encode("utf-8"))
+        return summary, False
+
+    def _run_level(self, level, texts, pool):
+        # Yield events as summaries finish; failed pieces keep their input text
+        results = list(texts)
+        futures = {pool.submit(self._summarize, text): index for index, text in enumerate(texts)}
+        for future in as_completed(futures):
+            index = futures[future]
+            summary, cached = future.result()
+            if summary:
+                results[index] = summary
+            yield {"level": level, "index": index, "of": len(texts), "summary": results[index],
+                   "cached": cached, "failed": not summary, "final": False}
+        yield results
+
+    def _groups(self, summaries):
+        # Consecutive summaries packed up to chunk_chars, at least two per group
+        groups = [[]]
+        size = 0
+        for summary in summaries:
+            if len(groups[-1]) >= 2 and size + len(summary) > self.chunk_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += len(summary) + 2
+        if len(groups) > 1 and len(groups[-1]) == 1:
+            groups[-2].extend(groups.pop())
+        return ["\n\n".join(group) for group in groups]
+
+    def stream(self, text):
+        """
+        Summarize text, yielding progress as it happens
+
+        Yields:
+            dict: {"level", "index", "of", "summary", "cached", "failed", "final"}
+                  for each chunk (level 0) and reduce step (level 1+); the
+                  last event has "final": True and the whole summary (a
+                  failed piece is passed up unsummarized)
+        """
+        texts = chunk_text(text, self.chunk_chars, self.overlap)
+        if not texts:
+            yield {"level": 0, "index": 0, "of": 1, "summary": "", "cached": False, "failed": False, "final": True}
+            return
+        failed = False
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            level = 0
+            while True:
+                for event in self._run_level(level, texts, pool):
+                    if isinstance(event, dict):
+                        failed = failed or event["failed"]
+                        yield event
+                    else:
+                        summaries = event
+                if len(summaries) == 1 or level + 1 >= self.max_levels:
+                    break
+                texts = self._groups(summaries)
+                level += 1
+        yield {"level": level, "index": 0, "of": 1, "summary": "\n\n".join(summaries),
+               "cached": False, "failed": failed, "final": True}
+
+    def summarize(self, text):
+        """
+        Returns:
+            str: Summary of the whole text, or None if a model call failed
+                 (the parts that worked are cached for the next try)
+        """
+        for event in self.stream(text):
+            pass
+        return None if event["failed"] else event["summary"]
+
+    def stats(self):
+        return {"calls": self.calls, "cached": self.cached}
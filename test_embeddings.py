@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import embeddings
+from embeddings import DocumentStore
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    def embed(texts, model=None):
+        vectors = np.zeros((len(texts), 8), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vectors[row, hash(text) % 8] = 1.0
+        return vectors
+
+    monkeypatch.setattr(embeddings, "embed_texts", embed)
+
+
+def test_default_ids_are_not_reused_after_delete(tmp_path):
+    store = DocumentStore(str(tmp_path))
+    first = store.add(["a", "b", "c"])
+    store.delete([first[0]])
+    store.compact()
+    second = store.add(["d"])
+    assert second[0] not in first
+    assert {doc["text"] for doc in store.docs} == {"b", "c", "d"}
+
+    store.save()
+    reloaded = DocumentStore(str(tmp_path))
+    assert reloaded.add(["e"])[0] not in first + second
+
+
+def test_existing_id_needs_replace(tmp_path):
+    store = DocumentStore()
+    store.add(["a"], ids=["x"])
+    with pytest.raises(ValueError):
+        store.add(["b"], ids=["x"])
+    store.add(["b"], ids=["x"], replace=True)
+    assert len(store) == 1
+    assert store.docs[store._rows["x"]]["text"] == "b"
+
+
+def test_interrupted_save_is_repaired_on_load(tmp_path):
+    store = DocumentStore(str(tmp_path))
+    store.add(["a", "b"])
+    store.save()
+    store.add(["c", "d"])
+    store.index.save(str(tmp_path))  # vectors written, crash before docs.jsonl
+
+    reloaded = DocumentStore(str(tmp_path))
+    assert len(reloaded.index) == len(reloaded.docs) == 2
+    assert {hit["text"] for hit in reloaded.search("c", k=4)} == {"a", "b"}
+    reloaded.add(["e"])
+    reloaded.save()
+    again = DocumentStore(str(tmp_path))
+    assert len(again.index) == len(again.docs) == 3
+    assert [doc["text"] for doc in again.docs] == ["a", "b", "e"]
+
+
+def test_failed_re_add_keeps_the_old_passages(monkeypatch):
+    store = DocumentStore()
+    store.add_documents({"doc": "Old text."})
+    monkeypatch.setattr(embeddings, "embed_texts", lambda texts, model=None: None)
+    assert store.add_documents({"doc": "New text."}) is None
+    assert len(store) == 1
@@ -0,0 +1,35 @@
+import asyncio
+
+import load_test
+
+
+def _fixed_latency(seconds, parallel=None):
+    slots = None
+
+    async def query(prompt, **kwargs):
+        nonlocal slots
+        if parallel is None:
+            await asyncio.sleep(seconds)
+            return "ok"
+        slots = slots or asyncio.Semaphore(parallel)
+        async with slots:
+            await asyncio.sleep(seconds)
+        return "ok"
+
+    return query
+
+
+def test_slow_but_unsaturated_server_has_no_knee():
+    # Each request takes half the step; the server still keeps up at every rate
+    steps = [asyncio.run(load_test.run_step(_fixed_latency(0.5), rate, 1.0, poisson=False))
+             for rate in (4, 8, 16)]
+    for step in steps:
+        assert step["throughput_rps"] >= 0.9 * step["offered_rps"]
+    assert load_test.find_knee(steps) is None
+
+
+def test_saturated_server_is_found():
+    # One request at a time, 0.1s each: at most 10 req/s
+    steps = [asyncio.run(load_test.run_step(_fixed_latency(0.1, parallel=1), rate, 1.0, poisson=False))
+             for rate in (5, 20)]
+    assert load_test.find_knee(steps) == 1
@@ -0,0 +1,25 @@
+import ollama_residency
+from ollama_residency import ModelScheduler, ResidencyManager
+
+
+def test_unpinned_model_runs_when_every_resident_model_is_pinned(monkeypatch):
+    monkeypatch.setattr(ollama_residency, "query_ollama", lambda prompt, model, **kwargs: {"model": model})
+    residency = ResidencyManager(preload=[], pinned=["mistral"], max_resident=1)
+    residency.resident = {"mistral:latest"}
+    scheduler = ModelScheduler(residency, parallel=1, max_wait=0.1)
+    try:
+        future = scheduler.submit("Hi", model="llama3.1:8b")
+        assert future.result(timeout=5) == {"model": "llama3.1:8b"}
+        assert scheduler.stats()["switches"] == 1
+    finally:
+        scheduler.close()
+
+
+def test_close_finishes_queued_prompts(monkeypatch):
+    monkeypatch.setattr(ollama_residency, "query_ollama", lambda prompt, model, **kwargs: prompt)
+    monkeypatch.setattr(ollama_residency, "load_model", lambda model, keep_alive: True)
+    residency = ResidencyManager(preload=[], pinned=[], max_resident=1)
+    scheduler = ModelScheduler(residency, parallel=2, max_wait=0.1)
+    futures = [scheduler.submit(str(n), model=model) for n, model in enumerate(["a", "b", "a", "b"])]
+    scheduler.close()
+    assert [f.result(timeout=0) for f in futures] == ["0", "1", "2", "3"]
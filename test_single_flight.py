@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import single_flight
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content):
+        self.content = content
+
+    def json(self):
+        return {"body": self.content.decode()}
+
+
+def _join(n, fn, kwargs):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(single_flight.do("POST", "http://llm/x", kwargs, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results, errors
+
+
+def test_concurrent_callers_share_one_request():
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.2)
+        return FakeResponse(b'"answer"')
+
+    results, errors = _join(8, fn, {"json": {"prompt": "hi"}})
+    assert not errors
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert all(response.json() for response, _ in results)
+    assert single_flight.stats()["in_flight"] == 0
+
+
+def test_leader_error_reaches_every_caller():
+    def fn():
+        time.sleep(0.2)
+        raise ConnectionError("upstream down")
+
+    results, errors = _join(4, fn, {"json": {"prompt": "error"}})
+    assert not results
+    assert len(errors) == 4 and all(isinstance(e, ConnectionError) for e in errors)
+    assert single_flight.stats()["in_flight"] == 0
+
+
+def test_async_callers_share_one_request():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return FakeResponse(b'"answer"')
+
+    async def main():
+        return await asyncio.gather(*[single_flight.do_async("POST", "http://llm/x", {"json": {"p": 1}}, fn)
+                                      for _ in range(5)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False] + [True] * 4
+
+
+def test_async_error_reaches_every_caller():
+    async def fn():
+        await asyncio.sleep(0.05)
+        raise ConnectionError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*[single_flight.do_async("POST", "http://llm/x", {"json": {"p": 2}}, fn)
+                                      for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+
+def test_cancelled_waiter_leaves_the_others_running():
+    async def fn():
+        await asyncio.sleep(0.1)
+        return FakeResponse(b'"answer"')
+
+    async def main():
+        kwargs = {"json": {"p": 3}}
+        first = asyncio.ensure_future(single_flight.do_async("POST", "http://llm/x", kwargs, fn))
+        second = asyncio.ensure_future(single_flight.do_async("POST", "http://llm/x", kwargs, fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    response, shared = asyncio.run(main())
+    assert shared and response.json() == "answer"  # decoded afresh from the shared body
+
+
+class FakeStream:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for chunk in self._chunks:
+            time.sleep(0.02)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_is_fanned_out_to_every_subscriber():
+    upstream = FakeStream([b"data: a\n", b"data: b\n", b"data: [DONE]\n"])
+    results, errors = _join(3, lambda: upstream, {"json": {"prompt": "s"}, "stream": True})
+    assert not errors
+    assert [list(r.iter_lines()) for r, _ in results] == [[b"data: a", b"data: b", b"data: [DONE]"]] * 3
+    assert upstream.closed
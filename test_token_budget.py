@@ -0,0 +1,41 @@
+import token_budget
+
+
+def test_long_ollama_context_is_dropped_before_the_prompt():
+    payload = {"model": "mistral", "prompt": "What is Docker?", "context": list(range(1800))}
+    adjusted = token_budget.preflight("http://localhost:11434/api/generate", payload, provider="ollama")
+    assert adjusted["prompt"] == "What is Docker?"
+    assert "context" not in adjusted
+    assert payload["context"]  # the caller's payload is untouched
+
+
+def test_fitting_payload_is_returned_as_is():
+    payload = {"model": "mistral", "prompt": "Hi", "context": [1, 2, 3]}
+    assert token_budget.preflight("http://localhost:11434/api/generate", payload, provider="ollama") is payload
+
+
+def test_session_keeps_less_context_than_preflight_allows():
+    from ollama_session import OllamaSession
+    session = OllamaSession(model="mistral")
+    assert session.max_context_tokens < token_budget.context_window("mistral", "ollama") - token_budget.MIN_OUTPUT
+
+
+def test_hf_max_length_includes_the_prompt():
+    prompt = "word " * 400  # ~572 tokens with the heuristic counter
+    payload = {"inputs": prompt, "parameters": {"max_length": 900}}
+    url = "https://api-inference.huggingface.co/models/facebook/bart-large-cnn"
+    adjusted = token_budget.preflight(url, payload, provider="hf")
+    # bart's window is 1024 tokens minus the 5% margin: 900 total fits
+    assert adjusted is payload
+
+    payload = {"inputs": prompt, "parameters": {"max_length": 2000}}
+    adjusted = token_budget.preflight(url, payload, provider="hf")
+    assert adjusted["parameters"]["max_length"] == 1024 - int(1024 * token_budget.APPROXIMATE_MARGIN)
+
+
+def test_count_cache_keeps_no_texts():
+    tokenizer = token_budget.Tokenizer("words", lambda text: text.split(), exact=True)
+    text = "a long prompt " * 1000
+    assert tokenizer.count(text) == tokenizer.count(text) == 3000
+    assert all(not isinstance(part, str) or part == "words"
+               for key in token_budget._count_cache for part in key)
@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+
+import vector_index
+from vector_index import VectorIndex, normalize
+
+
+def _vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_save_append_reload_round_trip(tmp_path, monkeypatch):
+    path = str(tmp_path)
+    first, second = _vectors(50), _vectors(30, seed=1)
+    index = VectorIndex()
+    index.add(first)
+    index.save(path)
+
+    # A reloaded (memory-mapped) index appends its new rows instead of rewriting the file
+    loaded = VectorIndex.load(path)
+    assert loaded.add(second).tolist() == list(range(50, 80))
+    rewritten = []
+    monkeypatch.setattr(vector_index, "_save_array", lambda p, a: rewritten.append(os.path.basename(p)))
+    loaded.save(path)
+    assert "vectors.npy" not in rewritten
+    monkeypatch.undo()
+
+    reloaded = VectorIndex.load(path, mmap=False)
+    np.testing.assert_allclose(reloaded.vectors, normalize(np.concatenate([first, second])), rtol=1e-6)
+    rows, _ = reloaded.search(second[3], k=1)
+    assert rows.tolist() == [53]
+
+
+def test_deletes_survive_reload_and_compact(tmp_path):
+    path = str(tmp_path)
+    vectors = _vectors(20)
+    index = VectorIndex()
+    index.add(vectors)
+    index.delete([0, 5])
+    index.save(path)
+
+    loaded = VectorIndex.load(path)
+    assert loaded.n_deleted == 2
+    assert 5 not in loaded.search(vectors[5], k=3)[0].tolist()
+    rows, _ = loaded.search_many(vectors[[1, 5]], k=20)
+    assert not np.isin(rows, [0, 5]).any()
+
+    mapping = loaded.compact()
+    assert mapping[0] == -1 and mapping[6] == 4
+    loaded.save(path)
+    compacted = VectorIndex.load(path)
+    assert len(compacted) == 18 and compacted.n_deleted == 0
+    assert compacted.search(vectors[6], k=1)[0].tolist() == [4]
+
+
+def test_ivf_index_appends_assignments(tmp_path):
+    path = str(tmp_path)
+    index = VectorIndex()
+    index.add(_vectors(200))
+    index.train_ivf(n_lists=8)
+    index.save(path)
+
+    loaded = VectorIndex.load(path)
+    extra = _vectors(10, seed=2)
+    loaded.add(extra)
+    loaded.save(path)
+    reloaded = VectorIndex.load(path)
+    assert len(reloaded) == len(reloaded.assignments) == 210
+    reloaded.nprobe = 8
+    assert reloaded.search(extra[0], k=1)[0].tolist() == [200]
@@ -0,0 +1,58 @@
+"""
+Text Splitting on sentence boundaries
+Shared by embeddings.py (retrieval passages) and summarize.py (map-reduce
+chunks). Standard library only.
+"""
+
+import re
+
+# Sentence ends, paragraph breaks
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def split_sentences(text, max_chars=1000):
+    """Sentences of text (paragraph breaks also split; longer ones are cut at max_chars)"""
+    sentences = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            sentences.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def split_text(text, max_chars=1000, overlap=150):
+    """
+    Split text into passages at sentence boundaries
+
+    Args:
+        text (str): The document
+        max_chars (int): Longest passage (a single longer sentence is cut)
+        overlap (int): Characters of trailing sentences repeated at the
+                       start of the next passage
+
+    Returns:
+        list: Passages in order
+    """
+    passages = []
+    current = []
+    size = 0
+    for sentence in split_sentences(text, max_chars):
+        if current and size + len(sentence) + 1 > max_chars:
+            passages.append(" ".join(current))
+            # Carry the last sentences over so context isn't cut mid-thought
+            carried = []
+            kept = 0
+            for previous in reversed(current):
+                if kept + len(previous) > overlap or kept + len(previous) + len(sentence) + 1 > max_chars:
+                    break
+                carried.insert(0, previous)
+                kept += len(previous) + 1
+            current, size = carried, kept
+        current.append(sentence)
+        size += len(sentence) + 1
+    if current:
+        passages.append(" ".join(current))
+    return passages
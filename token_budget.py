@@ -0,0 +1,345 @@
+"""
+Token Budgeting before a request is sent
+Counts prompt tokens locally with the model family's tokenizer (loaded
+lazily and cached: Hugging Face `tokenizers`, else `tiktoken`, else a
+characters-per-token estimate). Before a request goes out it:
+    - trims the oldest conversation turns (or compresses them into a short
+      note) when the prompt won't fit the model's context window, keeping
+      system messages and the latest message
+    - drops an Ollama "context" array that no longer fits, before touching
+      the new prompt
+    - lowers max_tokens (Ollama num_predict, Hugging Face max_length) to
+      what is left of the window, so the provider doesn't reject the call
+
+Hooked into http_client.request and async_client.post.
+
+Environment:
+    LLM_TOKEN_BUDGET=0        turn preflight off
+    LLM_TOKENIZER=heuristic   never load tokenizer files
+    LLM_MIN_OUTPUT_TOKENS     output room kept free when trimming (default 256)
+    OLLAMA_CONTEXT_LENGTH     Ollama's num_ctx when the request sets none (default 2048)
+"""
+
+import collections
+import functools
+import math
+import os
+import threading
+import time
+
+import metrics
+
+ENABLED = os.getenv("LLM_TOKEN_BUDGET", "1") == "1"
+TOKENIZER = os.getenv("LLM_TOKENIZER", "auto")
+MIN_OUTPUT = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "256"))
+OLLAMA_CONTEXT = int(os.getenv("OLLAMA_CONTEXT_LENGTH", "2048"))
+
+# (model name substring, context window, Hugging Face tokenizer repo, tiktoken encoding);
+# first match wins, so specific names come first
+CONTEXT_WINDOWS = [
+    ("llama-3", 131072, None, "cl100k_base"),
+    ("llama3", 131072, None, "cl100k_base"),
+    ("mixtral", 32768, "mistralai/Mixtral-8x7B-Instruct-v0.1", None),
+    ("mistral-7b-instruct-v0.1", 8192, "mistralai/Mistral-7B-Instruct-v0.1", None),
+    ("mistral", 32768, "mistralai/Mistral-7B-Instruct-v0.3", None),
+    ("qwen", 32768, "Qwen/Qwen2.5-7B-Instruct", None),
+    ("gemma", 8192, None, None),
+    ("phi", 4096, "microsoft/Phi-3-mini-4k-instruct", None),
+    ("gpt2", 1024, "gpt2", "gpt2"),
+    ("bart", 1024, "facebook/bart-large-cnn", "gpt2"),
+]
+DEFAULT_WINDOW = 4096
+
+# Chat formatting around each message (role, separators)
+MESSAGE_OVERHEAD = 4
+
+# Headroom for tokenizers that only approximate the model's own
+APPROXIMATE_MARGIN = 0.05
+
+# Token counts of recent texts, keyed by hash so the texts themselves aren't kept
+COUNT_CACHE_SIZE = 8192
+
+_lock = threading.Lock()
+_counts = {"checked": 0, "trimmed": 0, "clamped": 0, "seconds": 0.0}
+_count_cache = collections.OrderedDict()
+_count_lock = threading.Lock()
+
+
+class Tokenizer:
+    """
+    Token counter for one model family
+
+    Attributes:
+        name (str): Which tokenizer this is
+        exact (bool): Counts match the model's own tokenizer
+    """
+
+    def __init__(self, name, encode=None, exact=False):
+        self.name = name
+        self._encode = encode
+        self.exact = exact
+
+    def count(self, text):
+        return _count(self, text)
+
+
+def _count(tokenizer, text):
+    if tokenizer._encode is None:
+        # ~3.5 characters per token for English, rounded up to stay on the safe side
+        return math.ceil(len(text) / 3.5)
+    # Conversation history is recounted every turn; the cache makes that free
+    key = (tokenizer.name, len(text), hash(text))
+    with _count_lock:
+        count = _count_cache.get(key)
+        if count is not None:
+            _count_cache.move_to_end(key)
+            return count
+    count = len(tokenizer._encode(text))
+    with _count_lock:
+        _count_cache[key] = count
+        if len(_count_cache) > COUNT_CACHE_SIZE:
+            _count_cache.popitem(last=False)
+    return count
+
+
+def family_for(model):
+    """(context window, HF repo, tiktoken encoding) for a model name"""
+    name = (model or "").lower()
+    for pattern, window, repo, encoding in CONTEXT_WINDOWS:
+        if pattern in name:
+            return window, repo, encoding
+    return DEFAULT_WINDOW, None, None
+
+
+@functools.lru_cache(maxsize=None)
+def _load_tokenizer(repo, encoding):
+    if TOKENIZER != "heuristic":
+        if repo:
+            try:
+                from tokenizers import Tokenizer as HFTokenizer
+                hf = HFTokenizer.from_pretrained(repo)
+                return Tokenizer(f"hf:{repo}", lambda text: hf.encode(text, add_special_tokens=False).ids, exact=True)
+            except Exception:
+                pass  # not installed, offline or gated: fall through
+        try:
+            import tiktoken
+            enc = tiktoken.get_encoding(encoding or "cl100k_base")
+            return Tokenizer(f"tiktoken:{enc.name}", lambda text: enc.encode(text, disallowed_special=()),
+                             exact=encoding == "gpt2" and repo == "gpt2")
+        except Exception:
+            pass
+    return Tokenizer("heuristic")
+
+
+def get_tokenizer(model):
+    """Cached tokenizer for model's family (loaded on first use)"""
+    _, repo, encoding = family_for(model)
+    return _load_tokenizer(repo, encoding)
+
+
+def count_tokens(text, model):
+    return get_tokenizer(model).count(text)
+
+
+def _content(message):
+    content = message.get("content", "")
+    return content if isinstance(content, str) else str(content)
+
+
+def count_messages(messages, model):
+    """Prompt tokens of a chat message list"""
+    tokenizer = get_tokenizer(model)
+    return sum(tokenizer.count(_content(m)) + MESSAGE_OVERHEAD for m in messages) + 3
+
+
+def context_window(model, provider=None, payload=None):
+    """
+    Tokens the model can attend to (Ollama: the request's num_ctx, else
+    OLLAMA_CONTEXT_LENGTH, since that is what Ollama actually allocates)
+    """
+    window = family_for(model)[0]
+    if provider == "ollama":
+        options = (payload or {}).get("options") or {}
+        window = min(window, int(options.get("num_ctx") or OLLAMA_CONTEXT))
+    return window
+
+
+def truncate_text(text, tokens, model):
+    """
+    Shorten text to about `tokens` tokens, keeping its start and its end
+    """
+    tokenizer = get_tokenizer(model)
+    for _ in range(4):
+        have = tokenizer.count(text)
+        if have <= tokens:
+            return text
+        keep = max(0, int(len(text) * tokens / have * 0.95) - 5)
+        text = f"{text[:keep // 3]} ... {text[len(text) - (keep - keep // 3):]}" if keep > 0 else ""
+    return text
+
+
+def fit_messages(messages, model, budget, compress=None):
+    """
+    Drop the oldest turns until the messages fit in budget tokens
+
+    System messages and the last message are kept. Whatever is still too
+    long after that is truncated.
+
+    Args:
+        compress (callable): Optional compress(dropped_messages) -> str; the
+                             text is kept as a system note in their place
+
+    Returns:
+        list: Messages that fit (a new list; the input is not changed)
+    """
+    tokenizer = get_tokenizer(model)
+    sizes = [tokenizer.count(_content(m)) + MESSAGE_OVERHEAD for m in messages]
+    total = sum(sizes) + 3
+    if total <= budget:
+        return list(messages)
+
+    # Leave room for the note that replaces the dropped turns
+    target = budget - budget // 8 if compress is not None else budget
+    kept = list(range(len(messages)))
+    dropped = []
+    for i in range(len(messages) - 1):
+        if total <= target:
+            break
+        if messages[i].get("role") == "system":
+            continue
+        kept.remove(i)
+        dropped.append(messages[i])
+        total -= sizes[i]
+
+    result = [messages[i] for i in kept]
+    if compress is not None and dropped:
+        note = compress(dropped)
+        note_size = tokenizer.count(note or "") + MESSAGE_OVERHEAD
+        if note and total + note_size <= budget:
+            position = sum(1 for m in result if m.get("role") == "system")
+            result.insert(position, {"role": "system", "content": f"Earlier in this conversation: {note}"})
+            total += note_size
+
+    # Still too long (e.g. one huge message): cut the largest ones down
+    while total > budget:
+        sizes = [tokenizer.count(_content(m)) + MESSAGE_OVERHEAD for m in result]
+        largest = max(range(len(result)), key=lambda i: sizes[i])
+        target = max(1, sizes[largest] - MESSAGE_OVERHEAD - (total - budget))
+        shorter = truncate_text(_content(result[largest]), target, model)
+        if shorter == _content(result[largest]):
+            break
+        result[largest] = dict(result[largest], content=shorter)
+        total = sum(tokenizer.count(_content(m)) + MESSAGE_OVERHEAD for m in result) + 3
+    return result
+
+
+def _max_output(payload):
+    # (container dict, key, value) of the output limit in this payload shape
+    options = payload.get("options")
+    parameters = payload.get("parameters")
+    if "max_tokens" in payload:
+        return payload, "max_tokens", payload["max_tokens"]
+    if isinstance(options, dict) and "num_predict" in options:
+        return options, "num_predict", options["num_predict"]
+    if isinstance(parameters, dict):
+        for key in ("max_new_tokens", "max_length"):
+            if key in parameters:
+                return parameters, key, parameters[key]
+    return None, None, None
+
+
+def preflight(url, payload, provider=None, model=None, compress=None):
+    """
+    Fit payload to the model's context window
+
+    Args:
+        url (str): Request URL (the Hugging Face model is taken from it)
+        payload (dict): JSON body; never modified
+        provider (str): http_client.provider_for(url)
+        model (str): Model name (default: from payload / URL)
+
+    Returns:
+        dict: payload itself if it already fits, else an adjusted copy
+    """
+    if not ENABLED or not isinstance(payload, dict):
+        return payload
+    if model is None:
+        model = metrics.model_for(url, payload)
+    messages = payload.get("messages")
+    prompt = payload.get("prompt", payload.get("inputs"))
+    if not isinstance(messages, list) and not isinstance(prompt, str):
+        return payload  # embeddings, tags, ...
+
+    started = time.perf_counter()
+    tokenizer = get_tokenizer(model)
+    window = context_window(model, provider, payload)
+    margin = 0 if tokenizer.exact else int(window * APPROXIMATE_MARGIN)
+    if isinstance(messages, list):
+        used = count_messages(messages, model)
+    else:
+        # Ollama's returned context is replayed before the prompt
+        used = tokenizer.count(prompt) + len(payload.get("context") or [])
+    holder, key, requested = _max_output(payload)
+    requested = requested if isinstance(requested, int) and requested > 0 else None
+    # Hugging Face max_length counts the prompt too; the rest are output limits
+    total_length = key == "max_length"
+    if requested is not None and total_length:
+        requested = max(1, requested - used)
+
+    adjusted = payload
+    trimmed = clamped = False
+    reserve = min(requested or MIN_OUTPUT, MIN_OUTPUT)
+    if used + margin + reserve > window:
+        budget = max(1, window - margin - reserve)
+        adjusted = dict(payload)
+        if isinstance(messages, list):
+            adjusted["messages"] = fit_messages(messages, model, budget, compress)
+            used = count_messages(adjusted["messages"], model)
+        else:
+            field = "prompt" if "prompt" in payload else "inputs"
+            # The new turn goes first: drop the replayed context (its oldest
+            # tokens can't be cut without breaking the chat template), and only
+            # then shorten the prompt itself
+            adjusted.pop("context", None)
+            adjusted[field] = truncate_text(prompt, budget, model)
+            used = tokenizer.count(adjusted[field])
+        trimmed = True
+
+    available = max(1, window - margin - used)
+    if requested is not None and requested > available:
+        if adjusted is payload:
+            adjusted = dict(payload)
+        if holder is not payload:
+            holder = dict(holder)
+            adjusted["options" if key == "num_predict" else "parameters"] = holder
+        else:
+            holder = adjusted
+        holder[key] = available + used if total_length else available
+        clamped = True
+
+    with _lock:
+        _counts["checked"] += 1
+        _counts["trimmed"] += trimmed
+        _counts["clamped"] += clamped
+        _counts["seconds"] += time.perf_counter() - started
+    return adjusted
+
+
+def configure(enabled=None, min_output=None):
+    """Change preflight settings at runtime"""
+    global ENABLED, MIN_OUTPUT
+    if enabled is not None:
+        ENABLED = enabled
+    if min_output is not None:
+        MIN_OUTPUT = min_output
+
+
+def stats():
+    """
+    Returns:
+        dict: checked, trimmed, clamped requests and mean preflight time (µs)
+    """
+    with _lock:
+        checked = _counts["checked"]
+        return {"checked": checked, "trimmed": _counts["trimmed"], "clamped": _counts["clamped"],
+                "mean_us": round(_counts["seconds"] / checked * 1e6, 1) if checked else 0.0}
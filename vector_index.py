@@ -0,0 +1,311 @@
+"""
+NumPy Vector Index for embedding search
+Cosine similarity over a contiguous float32 matrix (brute-force dot
+product), with optional IVF partitioning for large indexes and
+memory-mapped persistence for fast reloads. Rows can be deleted (masked
+until compact()), and saving an index that was loaded from the same
+directory only appends the new rows to the .npy files.
+Requires: pip install numpy
+"""
+
+import io
+import json
+import os
+
+import numpy as np
+
+
+def normalize(vectors):
+    """Return float32 rows scaled to unit length"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _save_array(path, array):
+    # Write beside the target and swap it in, so a memory-mapped copy of the
+    # old file stays valid while we read from it
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp, path)
+
+
+def _append_array(path, rows, saved_rows):
+    """
+    Append rows to an .npy file in place. numpy leaves room in the header
+    for the first dimension to grow, so only the new rows and the header
+    are written. Returns False if the file isn't saved_rows rows of the
+    same layout (the caller then rewrites it).
+    """
+    rows = np.ascontiguousarray(rows)
+    try:
+        f = open(path, "r+b")
+    except OSError:
+        return False
+    with f:
+        if np.lib.format.read_magic(f) != (1, 0):
+            return False
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        offset = f.tell()
+        if fortran_order or dtype != rows.dtype or shape != (saved_rows,) + rows.shape[1:]:
+            return False
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (saved_rows + len(rows),) + rows.shape[1:],
+        })
+        if len(header.getvalue()) != offset:
+            return False
+        # Data first, header last: until the header changes readers see the old shape
+        f.seek(offset + saved_rows * dtype.itemsize * int(np.prod(rows.shape[1:])))
+        f.write(rows.tobytes())
+        f.truncate()
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over unit-normalized float32 vectors
+
+    Args:
+        dim (int): Vector dimension (taken from the first add if None)
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim
+        self.vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self.centroids = None
+        self.assignments = None
+        self.deleted = None     # bool mask, created by the first delete()
+        self.nprobe = 8
+        self._saved = None      # (directory, rows) last written there
+        self._mmap = False
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def add(self, vectors):
+        """
+        Append vectors and return their row numbers
+        """
+        vectors = normalize(vectors)
+        if self.dim is None or len(self.vectors) == 0:
+            self.dim = vectors.shape[1]
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+        start = len(self.vectors)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        if self.centroids is not None:
+            self.assignments = np.concatenate([self.assignments, self._nearest_centroid(vectors)])
+        if self.deleted is not None:
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(vectors), dtype=bool)])
+        return np.arange(start, start + len(vectors))
+
+    def delete(self, rows):
+        """
+        Exclude rows from search results (row numbers stay valid until compact())
+
+        Returns:
+            int: Rows newly deleted
+        """
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        if self.deleted is None:
+            self.deleted = np.zeros(len(self.vectors), dtype=bool)
+        before = int(self.deleted.sum())
+        self.deleted[rows] = True
+        return int(self.deleted.sum()) - before
+
+    @property
+    def n_deleted(self):
+        return 0 if self.deleted is None else int(self.deleted.sum())
+
+    def compact(self):
+        """
+        Drop deleted rows for good
+
+        Returns:
+            array: New row number for every old row (-1 if it was deleted)
+        """
+        keep = np.ones(len(self.vectors), dtype=bool) if self.deleted is None else ~self.deleted
+        mapping = np.full(len(self.vectors), -1, dtype=np.int64)
+        mapping[keep] = np.arange(int(keep.sum()))
+        self.vectors = np.ascontiguousarray(self.vectors[keep])
+        if self.assignments is not None:
+            self.assignments = self.assignments[keep]
+        self.deleted = None
+        self._saved = None
+        return mapping
+
+    def truncate(self, rows):
+        """
+        Keep only the first `rows` rows (e.g. rows whose metadata was never
+        saved); the next save() rewrites the files
+        """
+        if rows >= len(self.vectors):
+            return
+        self.vectors = self.vectors[:rows]
+        if self.assignments is not None:
+            self.assignments = self.assignments[:rows]
+        if self.deleted is not None:
+            self.deleted = self.deleted[:rows]
+        self._saved = None
+
+    def train_ivf(self, n_lists=None, iterations=10, seed=0):
+        """
+        Partition the index into n_lists clusters (k-means) for faster search
+
+        Searches then only scan the `nprobe` closest clusters. Worth it from
+        roughly 50k vectors upward.
+        """
+        n = len(self.vectors)
+        if n == 0:
+            return
+        n_lists = min(n_lists or int(np.sqrt(n)), n)
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(n, n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = self.vectors[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = normalize(centroids)
+        self.centroids = centroids
+        self.assignments = self._nearest_centroid(self.vectors)
+        self._saved = None
+
+    def _nearest_centroid(self, vectors):
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def search(self, query, k=5):
+        """
+        Find the k most similar vectors
+
+        Args:
+            query (array): One query vector
+            k (int): Number of results
+
+        Returns:
+            tuple: (rows, scores) as NumPy arrays, best first
+        """
+        if len(self.vectors) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = normalize(query)[0]
+
+        if self.centroids is not None:
+            probes = np.argsort(self.centroids @ query)[::-1][:self.nprobe]
+            rows = np.flatnonzero(np.isin(self.assignments, probes))
+            scores = self.vectors[rows] @ query
+            if self.deleted is not None:
+                scores[self.deleted[rows]] = -np.inf
+        else:
+            rows = None
+            scores = self.vectors @ query
+            if self.deleted is not None:
+                scores[self.deleted] = -np.inf
+
+        k = min(k, len(scores))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return (rows[top] if rows is not None else top), scores[top]
+
+    def search_many(self, queries, k=5, block=1024):
+        """
+        Top-k for many queries at once (one matrix product per block of queries)
+
+        Returns:
+            tuple: (rows, scores) arrays of shape (len(queries), k), best
+                   first; missing results are row -1 with score -inf
+        """
+        queries = normalize(queries)
+        k = max(0, min(k, len(self.vectors)))
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if k == 0:
+            return rows, scores
+
+        if self.centroids is not None:
+            # Each query probes different clusters
+            for i, query in enumerate(queries):
+                found, found_scores = self.search(query, k)
+                rows[i, :len(found)] = found
+                scores[i, :len(found)] = found_scores
+            return rows, scores
+
+        for start in range(0, len(queries), block):
+            block_scores = queries[start:start + block] @ self.vectors.T
+            if self.deleted is not None:
+                block_scores[:, self.deleted] = -np.inf
+            top = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(block_scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            top[~np.isfinite(top_scores)] = -1
+            rows[start:start + block] = top
+            scores[start:start + block] = top_scores
+        return rows, scores
+
+    def save(self, path):
+        """
+        Write the index to directory `path` (vectors as .npy for mmap reload)
+
+        If the index was loaded from or last saved to `path`, only rows added
+        since are written.
+        """
+        os.makedirs(path, exist_ok=True)
+        vectors_path = os.path.join(path, "vectors.npy")
+        saved_rows = self._saved[1] if self._saved and self._saved[0] == os.path.abspath(path) else None
+        appended = saved_rows is not None and saved_rows <= len(self.vectors) and \
+            _append_array(vectors_path, self.vectors[saved_rows:], saved_rows)
+        if appended and self.centroids is not None:
+            appended = _append_array(os.path.join(path, "assignments.npy"),
+                                     self.assignments[saved_rows:], saved_rows)
+        if not appended:
+            _save_array(vectors_path, self.vectors)
+            if self.centroids is not None:
+                _save_array(os.path.join(path, "centroids.npy"), self.centroids)
+                _save_array(os.path.join(path, "assignments.npy"), self.assignments)
+
+        deleted_path = os.path.join(path, "deleted.npy")
+        if self.deleted is not None:
+            _save_array(deleted_path, self.deleted)
+        elif os.path.exists(deleted_path):
+            os.remove(deleted_path)
+        with open(os.path.join(path, "index.json"), "w") as f:
+            json.dump({"dim": self.dim, "nprobe": self.nprobe}, f)
+        self._saved = (os.path.abspath(path), len(self.vectors))
+        if self._mmap:
+            # Rows added in memory since loading are on disk now; map them instead
+            self.vectors = np.load(vectors_path, mmap_mode="r")
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load an index saved with save(); vectors are memory-mapped by default
+        """
+        with open(os.path.join(path, "index.json")) as f:
+            info = json.load(f)
+        index = cls(info["dim"])
+        index.nprobe = info.get("nprobe", index.nprobe)
+        index.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        if os.path.exists(os.path.join(path, "centroids.npy")):
+            index.centroids = np.load(os.path.join(path, "centroids.npy"))
+            index.assignments = np.load(os.path.join(path, "assignments.npy"))
+        if os.path.exists(os.path.join(path, "deleted.npy")):
+            index.deleted = np.load(os.path.join(path, "deleted.npy"))
+        index._mmap = mmap
+        index._saved = (os.path.abspath(path), len(index.vectors))
+        return index